@@ -11,7 +11,7 @@ import re
 import shutil
 import sys
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path, PurePosixPath
@@ -19,6 +19,10 @@ from typing import Any
 
 MANIFEST_NAME = ".s3-bucket-download-manifest.json"
 SIMPLE_ETAG_PATTERN = re.compile(r"^[0-9a-fA-F]{32}$")
+SIZE_PATTERN = re.compile(r"^(\d+)\s*([KMGT]?)(i?B)?$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+READ_CHUNK_SIZE = 1024 * 1024
+PART_ATTEMPTS = 3
 
 
 class Ansi:
@@ -133,6 +137,47 @@ class ProgressTracker:
         )
 
 
+class TransferBudget:
+    """Global cap on concurrent GET requests and on the bytes they are fetching.
+
+    Whole small objects and byte ranges of large ones both acquire a slot with
+    their length, so neither kind can starve the link for the other. A single
+    request larger than the byte cap is let through when nothing else is in
+    flight.
+    """
+
+    def __init__(self, max_connections: int, max_bytes: int) -> None:
+        self.max_connections = max_connections
+        self.max_bytes = max_bytes
+        self.connections = 0
+        self.bytes_in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        with self._condition:
+            while self.connections >= self.max_connections or (
+                self.connections and self.bytes_in_flight + size > self.max_bytes
+            ):
+                self._condition.wait()
+            self.connections += 1
+            self.bytes_in_flight += size
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self.connections -= 1
+            self.bytes_in_flight -= size
+            self._condition.notify_all()
+
+
+@dataclass(frozen=True)
+class TransferSettings:
+    transfer_config: Any
+    budget: TransferBudget
+    part_executor: ThreadPoolExecutor
+    multipart_threshold: int
+    part_size: int
+
+
 class SharedState:
     def __init__(self) -> None:
         self.lock = threading.Lock()
@@ -189,6 +234,30 @@ def parse_args() -> argparse.Namespace:
         default=min(16, max(4, (os.cpu_count() or 4) * 2)),
         help="Concurrent download worker count.",
     )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=32,
+        help="Cap on concurrent GET requests across whole objects and byte ranges.",
+    )
+    parser.add_argument(
+        "--max-inflight-bytes",
+        type=parse_size,
+        default="256M",
+        help="Cap on bytes being fetched at once across all requests, e.g. 256M or 1G.",
+    )
+    parser.add_argument(
+        "--multipart-threshold",
+        type=parse_size,
+        default="64M",
+        help="Objects at least this large are fetched as parallel byte ranges.",
+    )
+    parser.add_argument(
+        "--part-size",
+        type=parse_size,
+        default="16M",
+        help="Byte range size for large objects.",
+    )
     parser.add_argument(
         "--force",
         action="store_true",
@@ -207,6 +276,13 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def parse_size(value: str) -> int:
+    match = SIZE_PATTERN.fullmatch(value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}', expected e.g. 512K, 64M or 1G")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+
 def require_module(module_name: str, pip_name: str) -> Any:
     try:
         return __import__(module_name)
@@ -224,6 +300,7 @@ def load_runtime_dependencies() -> tuple[Any, Any, Any]:
 
 
 def get_s3_client(args: argparse.Namespace, boto3: Any) -> Any:
+    botocore_config = __import__("botocore.config", fromlist=["Config"])
     session_kwargs: dict[str, Any] = {}
     if args.profile:
         session_kwargs["profile_name"] = args.profile
@@ -232,7 +309,10 @@ def get_s3_client(args: argparse.Namespace, boto3: Any) -> Any:
 
     session = boto3.session.Session(**session_kwargs)
 
-    client_kwargs: dict[str, Any] = {}
+    # One pooled connection per concurrent request, instead of botocore's default of 10.
+    client_kwargs: dict[str, Any] = {
+        "config": botocore_config.Config(max_pool_connections=args.max_connections)
+    }
     if args.endpoint_url:
         client_kwargs["endpoint_url"] = args.endpoint_url
 
@@ -449,9 +529,88 @@ def seed_state_from_manifest(
             state.register(sha256, etag if isinstance(etag, str) else None, size, path)
 
 
+def download_range(
+    client: Any,
+    bucket: str,
+    obj: ObjectInfo,
+    fd: int,
+    start: int,
+    end: int,
+    budget: TransferBudget,
+    progress: ProgressTracker,
+) -> None:
+    length = end - start + 1
+    request: dict[str, Any] = {"Bucket": bucket, "Key": obj.key, "Range": f"bytes={start}-{end}"}
+    if obj.etag:
+        # Fail instead of stitching together ranges of two versions of the object.
+        request["IfMatch"] = f'"{obj.etag}"'
+
+    for attempt in range(1, PART_ATTEMPTS + 1):
+        written = 0
+        budget.acquire(length)
+        try:
+            body = client.get_object(**request)["Body"]
+            try:
+                for chunk in iter(lambda: body.read(READ_CHUNK_SIZE), b""):
+                    os.pwrite(fd, chunk, start + written)
+                    written += len(chunk)
+                    progress.callback(len(chunk))
+            finally:
+                body.close()
+            if written != length:
+                raise OSError(f"short read for bytes {start}-{end}: got {written} of {length}")
+            return
+        except Exception:
+            progress.callback(-written)
+            if attempt == PART_ATTEMPTS:
+                raise
+        finally:
+            budget.release(length)
+
+
+def download_in_ranges(
+    client: Any,
+    bucket: str,
+    obj: ObjectInfo,
+    temp_path: Path,
+    settings: TransferSettings,
+    progress: ProgressTracker,
+) -> None:
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, obj.size)
+        else:
+            os.ftruncate(fd, obj.size)
+
+        futures = [
+            settings.part_executor.submit(
+                download_range,
+                client,
+                bucket,
+                obj,
+                fd,
+                start,
+                min(start + settings.part_size, obj.size) - 1,
+                settings.budget,
+                progress,
+            )
+            for start in range(0, obj.size, settings.part_size)
+        ]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        # Let parts that already started finish before the file is closed under them.
+        wait(pending)
+        for future in done:
+            future.result()
+    finally:
+        os.close(fd)
+
+
 def download_object(
     client: Any,
-    transfer_config: Any,
+    settings: TransferSettings,
     bucket: str,
     destination: Path,
     manifest_objects: dict[str, Any],
@@ -490,13 +649,20 @@ def download_object(
         temp_path.unlink()
 
     try:
-        client.download_file(
-            bucket,
-            obj.key,
-            str(temp_path),
-            Callback=progress.callback,
-            Config=transfer_config,
-        )
+        if obj.size >= settings.multipart_threshold and hasattr(os, "pwrite"):
+            download_in_ranges(client, bucket, obj, temp_path, settings, progress)
+        else:
+            settings.budget.acquire(obj.size)
+            try:
+                client.download_file(
+                    bucket,
+                    obj.key,
+                    str(temp_path),
+                    Callback=progress.callback,
+                    Config=settings.transfer_config,
+                )
+            finally:
+                settings.budget.release(obj.size)
         result = finalize_download(temp_path, target, destination, obj, state, dedupe_enabled)
         progress.mark_completed()
         return result
@@ -512,6 +678,10 @@ def main() -> None:
 
     if args.workers < 1:
         raise SystemExit("--workers must be at least 1")
+    if args.max_connections < 1:
+        raise SystemExit("--max-connections must be at least 1")
+    if args.part_size < 1 or args.max_inflight_bytes < 1:
+        raise SystemExit("--part-size and --max-inflight-bytes must be positive")
 
     destination = args.destination.expanduser().resolve()
     destination.mkdir(parents=True, exist_ok=True)
@@ -521,7 +691,9 @@ def main() -> None:
     manifest_objects: dict[str, Any] = manifest["objects"]
 
     client = get_s3_client(args, boto3)
-    transfer_config = transfer_config_cls(use_threads=False)
+    # Objects below the threshold are a single GET; larger ones are split by download_in_ranges.
+    multipart_threshold = max(args.multipart_threshold, 1)
+    transfer_config = transfer_config_cls(use_threads=False, multipart_threshold=multipart_threshold)
 
     console.info(
         f"Listing s3://{args.bucket}/{args.prefix} into {destination}"
@@ -543,13 +715,30 @@ def main() -> None:
     failures: list[tuple[str, str]] = []
     results: dict[str, DownloadResult] = {}
 
+    large_count = sum(1 for obj in objects if obj.size >= multipart_threshold)
+    if large_count:
+        console.info(
+            f"{large_count} object(s) of {multipart_threshold:,}+ bytes will be fetched in "
+            f"{args.part_size:,}-byte ranges."
+        )
+
     try:
-        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor, ThreadPoolExecutor(
+            max_workers=args.max_connections
+        ) as part_executor:
+            settings = TransferSettings(
+                transfer_config=transfer_config,
+                budget=TransferBudget(args.max_connections, args.max_inflight_bytes),
+                part_executor=part_executor,
+                multipart_threshold=multipart_threshold,
+                part_size=args.part_size,
+            )
+            # Largest first, so a huge object is not left as the lone tail of the run.
             future_map = {
                 executor.submit(
                     download_object,
                     client,
-                    transfer_config,
+                    settings,
                     args.bucket,
                     destination,
                     manifest_objects,
@@ -559,7 +748,7 @@ def main() -> None:
                     args.force,
                     not args.no_dedupe,
                 ): obj
-                for obj in objects
+                for obj in sorted(objects, key=lambda item: item.size, reverse=True)
             }
 
             for future in as_completed(future_map):
@@ -1,17 +1,41 @@
 import argparse
 import asyncio
+import contextlib
+import csv
+import hashlib
+import importlib.util
+import itertools
 import json
 import logging
 import os
 import re
+import sqlite3
+import struct
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
-from datetime import date, datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from multiprocessing import get_context
+from time import process_time
 from uuid import UUID
 
 import asyncpg
 import httpx
-from supabase import create_client
 from tqdm import tqdm
 
 logging.basicConfig(
@@ -27,6 +51,223 @@ DEFAULT_TYPESENSE_HOST = os.environ.get(
 )
 
 
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout (seconds by default)."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class SyncMetrics:
+    """Counters, histograms and gauges for one sync run.
+
+    Everything is updated from the event loop thread without awaiting in
+    between, so no lock is needed. Gauges are callables read at scrape time
+    (queue depth, requests in flight, ...).
+    """
+
+    COUNTERS = {
+        "rows_fetched": "Rows read from the source",
+        "bytes_encoded": "JSONL bytes produced by the encoder",
+        "total_batches": "Batches handed to the sink",
+        "failed_batches": "Batches that failed after all retries",
+        "successful_docs": "Documents accepted by the sink",
+        "failed_docs": "Documents rejected one by one by Typesense",
+        "import_requests": "Import requests sent to Typesense",
+        "import_bytes": "Import payload bytes sent to Typesense",
+        "import_retries": "Import requests retried after an error or timeout",
+        "import_too_large": "Import requests rejected with 413 and split",
+        "skipped_unchanged": "Documents skipped because Typesense already holds them unchanged",
+        "callbacks_sent": "Aggregate notifications delivered to --callback-url",
+        "callbacks_failed": "Callback POSTs that failed or returned an error status",
+        "callbacks_dropped": "Notifications dropped or spilled because the callback queue was full",
+    }
+    HISTOGRAMS = {
+        "fetch_seconds": "Time spent waiting for the next chunk from the source",
+        "encode_seconds": "Time spent encoding one chunk to JSONL",
+        "import_wait_seconds": "Time an import waited for a request slot",
+        "import_seconds": "Latency of one import request",
+    }
+
+    def __init__(self, labels: Optional[Dict[str, str]] = None):
+        self.labels = labels or {}
+        self.counters: Dict[str, float] = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms = {name: Histogram() for name in self.HISTOGRAMS}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.started: Optional[float] = None
+
+    def start(self):
+        if self.started is None:
+            self.started = asyncio.get_running_loop().time()
+
+    def inc(self, name: str, value: float = 1):
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].observe(value)
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return asyncio.get_running_loop().time() - self.started
+
+    def summary(self) -> Dict[str, float]:
+        return {name: value for name, value in self.counters.items() if value}
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = self.elapsed()
+        return {
+            **self.labels,
+            "elapsed_seconds": round(elapsed, 3),
+            "counters": dict(self.counters),
+            "rates": {
+                "rows_fetched_per_second": (
+                    round(self.counters["rows_fetched"] / elapsed, 1) if elapsed else None
+                ),
+                "docs_indexed_per_second": (
+                    round(self.counters["successful_docs"] / elapsed, 1) if elapsed else None
+                ),
+            },
+            # Summed over concurrent workers, so these can exceed elapsed_seconds.
+            "stage_seconds": {
+                name[: -len("_seconds")]: round(h.sum, 3) for name, h in self.histograms.items()
+            },
+            "histograms": {name: h.report() for name, h in self.histograms.items()},
+            "gauges": {name: read() for name, read in self.gauges.items()},
+        }
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, str], **extra: str) -> str:
+    merged = {**labels, **extra}
+    if not merged:
+        return ""
+    body = ",".join(f'{key}="{escape_label(value)}"' for key, value in merged.items())
+    return "{" + body + "}"
+
+
+def render_prometheus(metrics: List[SyncMetrics]) -> str:
+    """Prometheus text exposition of one or more runs (one label set each)."""
+    prefix = "pg_to_tp_"
+    out: List[str] = []
+    for name, help_text in SyncMetrics.COUNTERS.items():
+        out += [f"# HELP {prefix}{name}_total {help_text}", f"# TYPE {prefix}{name}_total counter"]
+        for m in metrics:
+            out.append(f"{prefix}{name}_total{format_labels(m.labels)} {m.counters[name]}")
+    for name, help_text in SyncMetrics.HISTOGRAMS.items():
+        out += [f"# HELP {prefix}{name} {help_text}", f"# TYPE {prefix}{name} histogram"]
+        for m in metrics:
+            h = m.histograms[name]
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                out.append(
+                    f"{prefix}{name}_bucket{format_labels(m.labels, le=str(bound))} {cumulative}"
+                )
+            out.append(f"{prefix}{name}_bucket{format_labels(m.labels, le='+Inf')} {h.count}")
+            out.append(f"{prefix}{name}_sum{format_labels(m.labels)} {h.sum}")
+            out.append(f"{prefix}{name}_count{format_labels(m.labels)} {h.count}")
+    gauges = sorted({name for m in metrics for name in m.gauges})
+    for name in gauges:
+        out.append(f"# TYPE {prefix}{name} gauge")
+        for m in metrics:
+            if name in m.gauges:
+                out.append(f"{prefix}{name}{format_labels(m.labels)} {m.gauges[name]()}")
+    return "\n".join(out) + "\n"
+
+
+@contextlib.asynccontextmanager
+async def serve_metrics(config: "SyncConfig", metrics: List[SyncMetrics]):
+    """Answer `GET /metrics` on --metrics-port while the block runs."""
+    if not config.metrics_port:
+        yield
+        return
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 10)
+            while await asyncio.wait_for(reader.readline(), 10) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+                status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+                body = render_prometheus(metrics).encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, config.metrics_host, config.metrics_port)
+    logger.info(f"Serving metrics on http://{config.metrics_host}:{config.metrics_port}/metrics")
+    try:
+        yield
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def write_metrics_report(path: str, metrics: List[SyncMetrics]):
+    reports = [m.report() for m in metrics]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(reports[0] if len(reports) == 1 else {"jobs": reports}, f, indent=2)
+    os.replace(tmp, path)
+    logger.info(f"Wrote metrics report to {path}")
+
+
+def log_metrics(metrics: SyncMetrics, title: str = "Sync metrics"):
+    stages = ", ".join(
+        f"{name[: -len('_seconds')]} {h.sum:.1f}s" for name, h in metrics.histograms.items()
+    )
+    logger.info(f"{title}: {metrics.summary()}")
+    logger.info(f"Time per stage (summed over workers): {stages}")
+
+
 @dataclass
 class SyncConfig:
     table_name: str
@@ -43,29 +284,124 @@ class SyncConfig:
     typesense_api_key: str = DEFAULT_TYPESENSE_API_KEY
     callback_url: Optional[str] = None
     callback_headers: Dict[str, str] = None
+    callback_interval: float = 5.0
+    callback_queue_size: int = 100
+    callback_retries: int = 5
+    callback_overflow: str = "drop"
+    callback_spill: str = "failed_callbacks.jsonl"
     failed_batch_log: str = "failed_typesense_batches.log"
-    metrics: Dict[str, int] = field(
-        default_factory=lambda: {
-            "total_batches": 0,
-            "failed_batches": 0,
-            "successful_docs": 0,
-        }
-    )
-    metrics_lock: Optional[asyncio.Lock] = None
+    spool_path: Optional[str] = "failed_typesense_documents.db"
+    replay_failed: bool = False
+    digest_cache: Optional[str] = None
+    num_workers: int = 20
+    max_pending_batches: int = 40
+    max_batch_bytes: int = 1_000_000
+    adaptive: bool = False
+    target_latency: float = 2.0
+    pagination: str = "offset"
+    cursor_file: Optional[str] = None
+    checkpoint: Optional[str] = None
+    resume: bool = False
+    partitions: int = 1
+    partition_order: str = "any"
+    partition_progress: bool = False
+    document_id_column: Optional[str] = None
+    incremental: bool = False
+    updated_column: str = "last_updated_at"
+    state_file: str = "pg_to_tp_state.json"
+    schema_cache: Optional[str] = "pg_to_tp_schema.json"
+    refresh_schema: bool = False
+    schema_sample_rows: int = 1000
+    delete_mode: str = "none"
+    tombstone_column: Optional[str] = None
+    follow: bool = False
+    follow_plugin: str = "pgoutput"
+    slot_name: Optional[str] = None
+    publication_name: Optional[str] = None
+    follow_interval: float = 1.0
+    follow_max_changes: int = 5000
+    metrics: SyncMetrics = field(default_factory=SyncMetrics)
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+    metrics_report: Optional[str] = None
+    http_max_connections: int = 32
+    http_keepalive_expiry: float = 30.0
+    http2: bool = False
+    http_timeout: float = 60.0
+    http_client: Optional[httpx.AsyncClient] = None
+    json_engine: str = "auto"
+    transform_processes: int = 0
+    column_types: Optional[Dict[str, str]] = None
+    document_encoder: Optional["DocumentEncoder"] = None
+    import_control: Optional["ImportControl"] = None
+    failed_spool: Optional["FailedDocumentSpool"] = None
+    digest_index: Optional["DigestIndex"] = None
+    callback_dispatcher: Optional["CallbackDispatcher"] = None
+    supabase_base_url: Optional[str] = None
+    source_file: Optional[str] = None
+    source_format: str = "auto"
+    sink_file: Optional[str] = None
+    jobs_file: Optional[str] = None
+    max_parallel_jobs: int = 4
+    max_db_connections: int = 8
+    max_inflight_bytes: int = 64_000_000
+    max_requests_per_second: float = 0
+    import_scheduler: Optional["ImportScheduler"] = None
+    shared_pool: Optional[asyncpg.Pool] = None
+    supabase_concurrency: int = 4
+    alias_swap: bool = False
+    keep_generations: int = 2
+    # Where <collection>_fields.txt is written; None skips it.
+    fields_dir: Optional[str] = "."
 
     @property
     def supabase_url(self) -> Optional[str]:
+        if self.supabase_base_url:
+            return self.supabase_base_url
         if self.supabase_project_ref:
             return f"https://{self.supabase_project_ref}.supabase.co"
         return None
 
 
-def parse_args() -> SyncConfig:
+def parse_args(argv: Optional[List[str]] = None) -> SyncConfig:
     parser = argparse.ArgumentParser(
         description="Sync data from Supabase or PostgreSQL into Typesense"
     )
-    parser.add_argument("table_name", help="Table to fetch from Supabase/Postgres")
-    parser.add_argument("collection_name", help="Typesense collection to create/index")
+    parser.add_argument("table_name", nargs="?", help="Table to fetch from Supabase/Postgres")
+    parser.add_argument(
+        "collection_name", nargs="?", help="Typesense collection to create/index"
+    )
+    parser.add_argument(
+        "--jobs-file",
+        help=(
+            "JSON file listing table/collection jobs to sync in one process under the shared "
+            "--max-* limits (replaces the positional arguments)"
+        ),
+    )
+    parser.add_argument(
+        "--max-parallel-jobs",
+        type=int,
+        default=4,
+        help="Jobs file: syncs running at the same time (default: 4)",
+    )
+    parser.add_argument(
+        "--max-db-connections",
+        type=int,
+        default=8,
+        help="Jobs file: Postgres connections shared by all jobs (default: 8)",
+    )
+    parser.add_argument(
+        "--max-inflight-bytes",
+        type=int,
+        default=64_000_000,
+        help="Jobs file: import payload bytes in flight across all jobs (default: 64000000)",
+    )
+    parser.add_argument(
+        "--max-requests-per-second",
+        type=float,
+        default=0,
+        help="Jobs file: import requests per second across all jobs, 0 for no limit (default: 0)",
+    )
     parser.add_argument(
         "--chunk-size",
         type=int,
@@ -90,6 +426,37 @@ def parse_args() -> SyncConfig:
         action="store_true",
         help="Drop the Typesense collection before syncing",
     )
+    parser.add_argument(
+        "--source-file",
+        help="Read rows from a local JSONL, CSV or Parquet (needs pyarrow) export instead of a database",
+    )
+    parser.add_argument(
+        "--source-format",
+        choices=["auto", "jsonl", "csv", "parquet"],
+        default="auto",
+        help="Format of --source-file; auto goes by the file extension (default: auto)",
+    )
+    parser.add_argument(
+        "--sink-file",
+        help=(
+            "Write Typesense-ready JSONL (and <file>.schema.json) here instead of importing "
+            "into Typesense"
+        ),
+    )
+    parser.add_argument(
+        "--alias-swap",
+        action="store_true",
+        help=(
+            "Blue/green load: import into a new timestamped collection, verify it, then point "
+            "the alias named collection_name at it"
+        ),
+    )
+    parser.add_argument(
+        "--keep-generations",
+        type=int,
+        default=2,
+        help="Alias swap: timestamped collections to keep, including the live one (default: 2)",
+    )
     parser.add_argument(
         "--pg-uri",
         "--postgresql-url",
@@ -104,6 +471,16 @@ def parse_args() -> SyncConfig:
         "--supabase-project-ref",
         help="Supabase project ref (e.g., abcd1234, falls back to SUPABASE_PROJECT_REF env var)",
     )
+    parser.add_argument(
+        "--supabase-url",
+        help="Supabase/PostgREST base URL instead of a project ref (falls back to SUPABASE_URL env var)",
+    )
+    parser.add_argument(
+        "--supabase-concurrency",
+        type=int,
+        default=4,
+        help="Supabase: Range requests in flight at once (default: 4)",
+    )
     parser.add_argument(
         "--typesense-host",
         default=DEFAULT_TYPESENSE_HOST,
@@ -119,9 +496,30 @@ def parse_args() -> SyncConfig:
         default="failed_typesense_batches.log",
         help="File path to append failed Typesense batch metadata",
     )
+    parser.add_argument(
+        "--spool-path",
+        default="failed_typesense_documents.db",
+        help="SQLite file keeping documents Typesense rejected, with their error; empty disables it",
+    )
+    parser.add_argument(
+        "--replay-failed",
+        action="store_true",
+        help="Re-import the documents spooled for this collection instead of reading the source",
+    )
+    parser.add_argument(
+        "--digest-cache",
+        help=(
+            "SQLite file of document id -> hash of the last document Typesense accepted; "
+            "unchanged documents are skipped and the collection is kept instead of recreated. "
+            "Delete the file (or use --drop-collection) if the collection changed behind its back"
+        ),
+    )
     parser.add_argument(
         "--callback-url",
-        help="URL to POST to after each successful Typesense batch import",
+        help=(
+            "URL to POST import progress to; per-batch events are summed into one "
+            "notification per collection every --callback-interval seconds"
+        ),
     )
     parser.add_argument(
         "--callback-header",
@@ -129,19 +527,404 @@ def parse_args() -> SyncConfig:
         default=[],
         help="Additional header for callback as 'Key:Value'; can repeat",
     )
+    parser.add_argument(
+        "--callback-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between aggregate callback notifications (default: 5)",
+    )
+    parser.add_argument(
+        "--callback-queue-size",
+        type=int,
+        default=100,
+        help="Notifications waiting for delivery before --callback-overflow applies (default: 100)",
+    )
+    parser.add_argument(
+        "--callback-retries",
+        type=int,
+        default=5,
+        help="Attempts per callback notification, with exponential backoff (default: 5)",
+    )
+    parser.add_argument(
+        "--callback-overflow",
+        choices=["drop", "spill"],
+        default="drop",
+        help=(
+            "What to do with a notification when the queue is full or retries run out: "
+            "drop it, or append it to --callback-spill (default: drop)"
+        ),
+    )
+    parser.add_argument(
+        "--callback-spill",
+        default="failed_callbacks.jsonl",
+        help="JSONL file for spilled callback notifications (default: failed_callbacks.jsonl)",
+    )
+    parser.add_argument(
+        "--http-max-connections",
+        type=int,
+        default=32,
+        help="Connections in the shared Typesense/callback HTTP pool (default: 32)",
+    )
+    parser.add_argument(
+        "--http-keepalive-expiry",
+        type=float,
+        default=30.0,
+        help="Seconds an idle pooled connection is kept open (default: 30)",
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Use HTTP/2 to Typesense when the 'h2' package is installed",
+    )
+    parser.add_argument(
+        "--http-timeout",
+        type=float,
+        default=60.0,
+        help="Per-request timeout in seconds for document imports (default: 60)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=0,
+        help="Serve Prometheus metrics on http://<metrics-host>:<port>/metrics while running",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Address for --metrics-port (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--metrics-report",
+        help="Write a JSON report of counters, rates and stage timings here when the run ends",
+    )
+    parser.add_argument(
+        "--json-engine",
+        choices=["auto", "orjson", "msgspec", "json"],
+        default="auto",
+        help="JSON encoder for import payloads; auto prefers orjson, then msgspec, then stdlib",
+    )
+    parser.add_argument(
+        "--transform-processes",
+        type=int,
+        default=0,
+        help=(
+            "Convert and JSON-encode rows in this many worker processes instead of the "
+            "event loop; use when the sync is CPU-bound (default: 0)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=20,
+        help="Concurrent Typesense import workers (default: 20)",
+    )
+    parser.add_argument(
+        "--max-pending-batches",
+        type=int,
+        default=40,
+        help="Import batches buffered between fetching and indexing before fetching pauses (default: 40)",
+    )
+    parser.add_argument(
+        "--max-batch-bytes",
+        type=int,
+        default=1_000_000,
+        help=(
+            "Upper bound on an import request body; batches are cut at this size or "
+            "--batch-size rows, whichever comes first (default: 1000000)"
+        ),
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help=(
+            "Adjust import concurrency and batch bytes AIMD-style: grow while imports are fast, "
+            "halve on 429/503 or when latency exceeds --target-latency"
+        ),
+    )
+    parser.add_argument(
+        "--target-latency",
+        type=float,
+        default=2.0,
+        help="Adaptive mode: import latency in seconds above which load is backed off (default: 2.0)",
+    )
+    parser.add_argument(
+        "--pagination",
+        choices=["offset", "keyset", "cursor"],
+        default="offset",
+        help=(
+            "Paging strategy: keyset pages on --id-column or the primary key (Supabase: --id-column "
+            "or 'id'), cursor streams the non-banned columns through one server-side cursor "
+            "(Postgres only; default: offset)"
+        ),
+    )
+    parser.add_argument(
+        "--cursor-file",
+        help="Keyset mode: file recording the last fully indexed key, used to resume an interrupted run",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help=(
+            "Journal of fetched key ranges and acknowledged imports (fsynced JSONL) for "
+            "keyset or key-partitioned Postgres runs"
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the run recorded in --checkpoint, skipping ranges already imported",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        help=(
+            "Split the Postgres table into N integer key ranges read in parallel, or ctid page "
+            "ranges on PostgreSQL 14+ (default: 1)"
+        ),
+    )
+    parser.add_argument(
+        "--partition-order",
+        choices=["any", "key"],
+        default="any",
+        help="'any' indexes chunks as soon as any partition returns them; 'key' preserves key order (default: any)",
+    )
+    parser.add_argument(
+        "--partition-progress",
+        action="store_true",
+        help="Show a progress bar per partition in addition to the overall one",
+    )
+    parser.add_argument(
+        "--document-id-column",
+        help="Column whose value becomes the Typesense document id (default in incremental mode: primary key)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch rows changed since the high-water mark stored in --state-file, and upsert them",
+    )
+    parser.add_argument(
+        "--updated-column",
+        default="last_updated_at",
+        help="Incremental mode: change-tracking column compared to the high-water mark (default: last_updated_at)",
+    )
+    parser.add_argument(
+        "--state-file",
+        default="pg_to_tp_state.json",
+        help="Incremental mode: file holding high-water marks per table/collection",
+    )
+    parser.add_argument(
+        "--schema-cache",
+        default="pg_to_tp_schema.json",
+        help="File caching the inferred Typesense fields per table; empty disables it",
+    )
+    parser.add_argument(
+        "--refresh-schema",
+        action="store_true",
+        help="Infer the schema again even if --schema-cache has an entry for the table",
+    )
+    parser.add_argument(
+        "--schema-sample-rows",
+        type=int,
+        default=1000,
+        help="Rows sampled to type columns the catalog cannot decide, or Supabase columns (default: 1000)",
+    )
+    parser.add_argument(
+        "--delete-mode",
+        choices=["none", "tombstone", "diff"],
+        default="none",
+        help=(
+            "Delete documents whose --tombstone-column is set (--incremental), or whose id "
+            "no longer exists in the table (--incremental, or a full run with --digest-cache) "
+            "(default: none)"
+        ),
+    )
+    parser.add_argument(
+        "--tombstone-column",
+        help="Column that marks a row as deleted when non-null and not false (e.g. deleted_at)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help=(
+            "After the initial load keep tailing a logical replication slot and apply changes "
+            "(needs wal_level=logical; the initial load only runs when the slot is new)"
+        ),
+    )
+    parser.add_argument(
+        "--follow-plugin",
+        choices=["pgoutput", "wal2json"],
+        default="pgoutput",
+        help="Logical decoding plugin for --follow (default: pgoutput)",
+    )
+    parser.add_argument(
+        "--slot-name",
+        help="Replication slot for --follow (default: pg_to_tp_<collection>)",
+    )
+    parser.add_argument(
+        "--publication",
+        dest="publication_name",
+        help="pgoutput publication for --follow (default: pg_to_tp_<table>)",
+    )
+    parser.add_argument(
+        "--follow-interval",
+        type=float,
+        default=1.0,
+        help="Seconds to wait between polls when the slot has no changes (default: 1.0)",
+    )
+    parser.add_argument(
+        "--follow-max-changes",
+        type=int,
+        default=5000,
+        help="Changes decoded per micro-batch (default: 5000)",
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.jobs_file:
+        for name in ("max_parallel_jobs", "max_db_connections", "max_inflight_bytes"):
+            if getattr(args, name) < 1:
+                parser.error(f"--{name.replace('_', '-')} must be at least 1")
+        return SyncConfig(
+            table_name="",
+            collection_name="",
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            global_limit=None,
+            id_column=None,
+            drop_collection=False,
+            pg_uri=None,
+            supabase_project_ref=None,
+            supabase_anon_key=None,
+            http_max_connections=args.http_max_connections,
+            http_keepalive_expiry=args.http_keepalive_expiry,
+            http2=args.http2,
+            http_timeout=args.http_timeout,
+            metrics_port=args.metrics_port,
+            metrics_host=args.metrics_host,
+            metrics_report=args.metrics_report,
+            jobs_file=args.jobs_file,
+            max_parallel_jobs=args.max_parallel_jobs,
+            max_db_connections=args.max_db_connections,
+            max_inflight_bytes=args.max_inflight_bytes,
+            max_requests_per_second=args.max_requests_per_second,
+        )
+    if not args.table_name or not args.collection_name:
+        parser.error("table_name and collection_name are required unless --jobs-file is given")
     supabase_ref = args.supabase_project_ref or os.environ.get("SUPABASE_PROJECT_REF")
     supabase_key = args.supabase_anon_key or os.environ.get("SUPABASE_ANON_KEY")
+    supabase_url = args.supabase_url or os.environ.get("SUPABASE_URL")
 
-    if not args.pg_uri and not (supabase_ref and supabase_key):
+    if args.replay_failed and not args.spool_path:
+        parser.error("--replay-failed requires --spool-path")
+    if (
+        not args.pg_uri
+        and not ((supabase_ref or supabase_url) and supabase_key)
+        and not args.replay_failed
+        and not args.source_file
+    ):
         parser.error(
-            "Provide either --pg-uri/--postgresql-url or both supabase project ref and anon key."
+            "Provide either --pg-uri/--postgresql-url or a supabase project ref (or URL) and anon key."
         )
 
-    if args.pg_uri:
+    if args.pg_uri or args.source_file:
         supabase_ref = None
         supabase_key = None
+        supabase_url = None
+    if args.source_file and args.pg_uri:
+        parser.error("--source-file cannot be combined with --pg-uri/--postgresql-url")
+    if args.source_file and args.pagination != "offset":
+        parser.error("--pagination does not apply to --source-file")
+    if args.sink_file and (
+        args.alias_swap or args.follow or args.delete_mode != "none" or args.replay_failed
+    ):
+        parser.error(
+            "--sink-file cannot be combined with --alias-swap, --follow, --delete-mode or --replay-failed"
+        )
+
+    if args.pagination == "cursor" and not args.pg_uri:
+        parser.error("--pagination cursor requires --pg-uri/--postgresql-url")
+    if args.cursor_file and args.pagination != "keyset":
+        parser.error("--cursor-file requires --pagination keyset")
+    if args.cursor_file and not args.pg_uri:
+        parser.error("--cursor-file requires --pg-uri/--postgresql-url")
+    if args.supabase_concurrency < 1:
+        parser.error("--supabase-concurrency must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.digest_cache and not (
+        args.document_id_column or args.incremental or args.follow
+    ):
+        parser.error(
+            "--digest-cache needs document ids: pass --document-id-column "
+            "(--incremental/--follow use the primary key)"
+        )
+    if args.digest_cache and (args.alias_swap or args.sink_file):
+        parser.error("--digest-cache cannot be combined with --alias-swap or --sink-file")
+    if args.transform_processes < 0:
+        parser.error("--transform-processes cannot be negative")
+    if args.max_batch_bytes < 1024:
+        parser.error("--max-batch-bytes must be at least 1024")
+    if args.target_latency <= 0:
+        parser.error("--target-latency must be positive")
+    if args.partitions < 1:
+        parser.error("--partitions must be at least 1")
+    if args.partitions > 1 and not args.pg_uri:
+        parser.error("--partitions requires --pg-uri/--postgresql-url")
+    if args.partitions > 1 and args.cursor_file:
+        parser.error("--cursor-file cannot be combined with --partitions")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.checkpoint and (
+        not args.pg_uri or (args.pagination != "keyset" and args.partitions == 1)
+    ):
+        parser.error(
+            "--checkpoint needs a Postgres source read with --pagination keyset or --partitions"
+        )
+    if args.checkpoint and (args.cursor_file or args.incremental or args.follow or args.alias_swap):
+        parser.error(
+            "--checkpoint cannot be combined with --cursor-file, --incremental, --follow or "
+            "--alias-swap"
+        )
+    if args.resume and args.drop_collection:
+        parser.error("--resume cannot be combined with --drop-collection")
+    for flag, column in (
+        ("--id-column", args.id_column),
+        ("--document-id-column", args.document_id_column),
+        ("--updated-column", args.updated_column),
+        ("--tombstone-column", args.tombstone_column),
+    ):
+        if column and not re.match(r"^\w+$", column):
+            parser.error(f"Invalid {flag} '{column}'")
+    if args.incremental and not args.pg_uri:
+        parser.error("--incremental requires --pg-uri/--postgresql-url")
+    if args.incremental and (args.partitions > 1 or args.pagination != "offset"):
+        parser.error("--incremental uses its own keyset paging; drop --partitions/--pagination")
+    if args.follow and not args.pg_uri:
+        parser.error("--follow requires --pg-uri/--postgresql-url")
+    if args.follow and args.incremental:
+        parser.error("--follow and --incremental cannot be combined")
+    if args.alias_swap and (args.drop_collection or args.incremental or args.cursor_file):
+        parser.error(
+            "--alias-swap cannot be combined with --drop-collection, --incremental or --cursor-file"
+        )
+    if args.keep_generations < 1:
+        parser.error("--keep-generations must be at least 1")
+    if args.delete_mode == "tombstone" and not args.incremental:
+        parser.error("--delete-mode tombstone requires --incremental")
+    if args.delete_mode == "diff" and not (
+        args.incremental or (args.digest_cache and args.pg_uri and not args.follow)
+    ):
+        parser.error(
+            "--delete-mode diff requires --incremental, or --digest-cache with --pg-uri on a "
+            "full run (which keeps the collection)"
+        )
+    if args.delete_mode == "tombstone" and not args.tombstone_column:
+        parser.error("--delete-mode tombstone requires --tombstone-column")
+
+    if args.callback_interval <= 0 or args.callback_queue_size < 1 or args.callback_retries < 1:
+        parser.error(
+            "--callback-interval must be positive and --callback-queue-size/--callback-retries "
+            "at least 1"
+        )
 
     headers = {}
     for header in args.callback_header:
@@ -158,17 +941,104 @@ def parse_args() -> SyncConfig:
         global_limit=args.global_limit,
         id_column=args.id_column,
         drop_collection=args.drop_collection,
+        alias_swap=args.alias_swap,
+        keep_generations=args.keep_generations,
         pg_uri=args.pg_uri,
         supabase_project_ref=supabase_ref,
         supabase_anon_key=supabase_key,
+        supabase_base_url=supabase_url,
+        source_file=args.source_file,
+        source_format=args.source_format,
+        sink_file=args.sink_file,
+        supabase_concurrency=args.supabase_concurrency,
         typesense_host=args.typesense_host,
         typesense_api_key=args.typesense_api_key,
         failed_batch_log=args.failed_batch_log,
+        spool_path=args.spool_path or None,
+        replay_failed=args.replay_failed,
+        digest_cache=args.digest_cache,
         callback_url=args.callback_url,
         callback_headers=headers if headers else None,
+        callback_interval=args.callback_interval,
+        callback_queue_size=args.callback_queue_size,
+        callback_retries=args.callback_retries,
+        callback_overflow=args.callback_overflow,
+        callback_spill=args.callback_spill,
+        num_workers=args.workers,
+        json_engine=args.json_engine,
+        transform_processes=args.transform_processes,
+        max_pending_batches=args.max_pending_batches,
+        max_batch_bytes=args.max_batch_bytes,
+        adaptive=args.adaptive,
+        target_latency=args.target_latency,
+        http_max_connections=args.http_max_connections,
+        http_keepalive_expiry=args.http_keepalive_expiry,
+        http2=args.http2,
+        http_timeout=args.http_timeout,
+        metrics=SyncMetrics({"table": args.table_name, "collection": args.collection_name}),
+        metrics_port=args.metrics_port,
+        metrics_host=args.metrics_host,
+        metrics_report=args.metrics_report,
+        pagination=args.pagination,
+        cursor_file=args.cursor_file,
+        checkpoint=args.checkpoint,
+        resume=args.resume,
+        partitions=args.partitions,
+        partition_order=args.partition_order,
+        partition_progress=args.partition_progress,
+        document_id_column=args.document_id_column,
+        incremental=args.incremental,
+        updated_column=args.updated_column,
+        state_file=args.state_file,
+        schema_cache=args.schema_cache or None,
+        refresh_schema=args.refresh_schema,
+        schema_sample_rows=args.schema_sample_rows,
+        delete_mode=args.delete_mode,
+        tombstone_column=args.tombstone_column,
+        follow=args.follow,
+        follow_plugin=args.follow_plugin,
+        slot_name=args.slot_name or re.sub(r"\W", "_", f"pg_to_tp_{args.collection_name}").lower(),
+        publication_name=args.publication_name
+        or re.sub(r"\W", "_", f"pg_to_tp_{args.table_name}").lower(),
+        follow_interval=args.follow_interval,
+        follow_max_changes=args.follow_max_changes,
+    )
+
+
+@dataclass
+class RowChunk:
+    rows: List[Dict[str, Any]]
+    last_key: Any = None
+    partition: int = 0
+
+
+def create_http_client(config: SyncConfig) -> httpx.AsyncClient:
+    http2 = config.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("--http2 needs the 'h2' package (pip install httpx[http2]); using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_connections,
+            keepalive_expiry=config.http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(config.http_timeout, connect=10.0),
     )
 
 
+def get_http_client(config: SyncConfig) -> httpx.AsyncClient:
+    """Return the sync's shared HTTP client, creating it on first use.
+
+    Every Typesense and callback request goes through this one pool so
+    connections (and TLS sessions) are reused across batches and workers.
+    """
+    if config.http_client is None:
+        config.http_client = create_http_client(config)
+    return config.http_client
+
+
 def infer_typesense_type(value: Any) -> Optional[str]:
     if isinstance(value, bool):
         return "bool"
@@ -254,151 +1124,801 @@ def validate_table_name(table_name: str) -> str:
     return table_name
 
 
-def clean_record(record: Dict[str, Any]) -> Dict[str, Any]:
-    return {k: v for k, v in record.items() if k not in BANNED_FIELDS}
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def format_select_list(columns: Optional[List[str]]) -> str:
+    if not columns:
+        return "*"
+    return ", ".join(quote_ident(c) for c in columns)
+
+
+def project_columns(
+    available: List[str], required: Optional[List[str]] = None
+) -> List[str]:
+    """Columns to request from the source: everything outside BANNED_FIELDS plus `required`."""
+    required = [c for c in (required or []) if c]
+    return [c for c in available if c not in BANNED_FIELDS or c in required]
 
 
 def coerce_value(value: Any) -> Any:
     if value is None:
         return ""
-    if isinstance(value, (datetime, date)):
+    if isinstance(value, (datetime, date, time)):
         return value.isoformat()
-    if isinstance(value, UUID):
+    if isinstance(value, (UUID, timedelta)):
         return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [coerce_value(v) for v in value]
+    if isinstance(value, asyncpg.Range):
+        return range_to_text(value)
     return value
 
 
-def build_typesense_schema_from_sample(
-    collection_name: str, sample_row: Dict[str, Any]
-) -> Dict[str, Any]:
-    fields: List[Dict[str, Any]] = []
-    for key, value in sample_row.items():
-        if key in BANNED_FIELDS:
-            logger.info(f"Skipping banned field '{key}'")
-            continue
-        ts_type = COMMON_COLUMN_TYPES.get(key)
-        if ts_type:
-            try:
-                if ts_type == "int64":
-                    value = int(value)
-                elif ts_type == "float":
-                    value = float(value)
-                elif ts_type == "bool":
-                    value = bool(value)
-                elif ts_type == "string":
-                    value = "" if value is None else str(value)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Skipping field '{key}' due to casting error: {e}")
-                continue
-        else:
-            ts_type = infer_typesense_type(value)
-            if ts_type == "string":
-                value = "" if value is None else str(value)
-        if not ts_type:
-            logger.warning(
-                f"Skipping field '{key}' (unsupported or null type: {type(value).__name__})"
-            )
-            continue
-        fields.append({"name": key, "type": ts_type, "optional": True})
+def load_json_encoder(engine: str) -> Tuple[str, Callable[[Any], bytes]]:
+    """Resolve --json-engine to (name, encode) where encode returns UTF-8 JSON bytes."""
+    if engine in ("auto", "orjson"):
+        try:
+            import orjson
 
-    if not fields:
-        raise ValueError("Could not infer any valid fields from sample row.")
+            return "orjson", orjson.dumps
+        except ImportError:
+            if engine == "orjson":
+                raise
+    if engine in ("auto", "msgspec"):
+        try:
+            import msgspec
 
-    default_sort = next(
-        (f["name"] for f in fields if f["type"] in ["int64", "float", "string"]),
-        fields[0]["name"],
-    )
+            return "msgspec", msgspec.json.Encoder().encode
+        except ImportError:
+            if engine == "msgspec":
+                raise
+    encode = json.JSONEncoder().encode
+    return "json", lambda obj: encode(obj).encode()
 
-    try:
-        with open(f"{collection_name}_fields.txt", "w", encoding="utf-8") as f:
-            for field in fields:
-                f.write(f"{field['name']}: {field['type']}\n")
-    except Exception as e:
-        logger.warning(f"Could not write fields to txt: {e}")
 
-    return {
-        "name": collection_name,
-        "fields": fields,
-        "default_sorting_field": default_sort,
-    }
+def to_int_or_zero(value: Any) -> int:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
 
 
-async def fetch_sample_row_from_supabase(supabase, table_name: str) -> Dict[str, Any]:
-    logger.info(f"Fetching sample row from Supabase table '{table_name}'")
+def kvk_to_int(value: Any) -> int:
     try:
-        response = supabase.table(table_name).select("*").limit(1).execute()
-        sample = response.data[0] if response.data else {}
-        if not sample:
-            raise ValueError("No data found to infer schema.")
-        return sample
-    except Exception as e:
-        logger.exception(f"Failed to fetch sample row: {e}")
-        raise
+        if isinstance(value, str):
+            value = value.strip().replace("-", "").replace(" ", "")
+        return int(value)
+    except (ValueError, TypeError, AttributeError):
+        return 0
 
 
-async def fetch_all_rows_from_supabase(
-    supabase, table: str, chunk_size: int, global_limit: Optional[int] = None
-) -> List[Dict[str, Any]]:
-    all_data = []
-    offset = 0
+def none_to_empty(value: Any) -> Any:
+    return "" if value is None else value
+
+
+def to_isoformat(value: Any) -> str:
+    return "" if value is None else value.isoformat()
+
+
+def to_text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+def to_float(value: Any) -> Any:
+    # NULL stays null: Typesense accepts null for an optional numeric field, not "".
+    return None if value is None else float(value)
+
+
+def as_is(value: Any) -> Any:
+    return value
+
+
+def to_list(value: Any) -> List[Any]:
+    # A NULL array is an empty one; null elements have no Typesense value either.
+    if value is None:
+        return []
+    return [coerce_value(v) for v in value if v is not None]
+
+
+def range_to_text(value: Any) -> str:
+    """Render an asyncpg Range (or a multirange's list of them) in Postgres literal form."""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "{" + ",".join(range_to_text(v) for v in value) + "}"
+    if value.isempty:
+        return "empty"
+    lower = "" if value.lower is None else coerce_value(value.lower)
+    upper = "" if value.upper is None else coerce_value(value.upper)
+    return (
+        f"{'[' if value.lower_inc else '('}{lower},{upper}{']' if value.upper_inc else ')'}"
+    )
+
+
+def is_range_type(sql_type: str) -> bool:
+    return sql_type.endswith("range")
+
+
+def is_temporal_type(sql_type: str) -> bool:
+    # Exact names only: daterange/tsrange are ranges, not dates.
+    return re.match(r"(date|time|timestamp)\b", sql_type) is not None
+
+
+SPECIAL_COLUMN_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "dexter_id": to_int_or_zero,
+    "kvk_number": kvk_to_int,
+}
+
+
+def converter_for_sql_type(sql_type: Optional[str]) -> Callable[[Any], Any]:
+    """Pick the value converter for a catalog type; unknown types fall back to coerce_value."""
+    if not sql_type:
+        return coerce_value
+    if sql_type.endswith("[]"):
+        return to_list
+    if is_range_type(sql_type):
+        return range_to_text
+    if is_temporal_type(sql_type):
+        return to_isoformat
+    if sql_type == "uuid":
+        return to_text
+    if sql_type.startswith("numeric"):
+        return to_float
+    if sql_type.startswith(("smallint", "integer", "bigint", "real", "double precision", "boolean")):
+        return as_is
+    if sql_type.startswith(("text", "character", "json")):
+        return none_to_empty
+    return coerce_value
+
+
+class DocumentEncoder:
+    """Turn source rows into a JSONL import body.
+
+    For every distinct column layout a plan of (column, converter) pairs is
+    compiled once: banned columns and `id` are left out, `dexter_id` and
+    `kvk_number` get their integer cleanup, and every other column gets a
+    converter chosen from its catalog type. Rows are then converted without
+    per-value isinstance checks or in-place mutation, and encoded lines are
+    joined into a single bytes payload.
+    """
+
+    def __init__(
+        self,
+        engine: str = "auto",
+        column_types: Optional[Dict[str, str]] = None,
+        document_id_column: Optional[str] = None,
+    ):
+        self.engine, self.dumps = load_json_encoder(engine)
+        self.column_types = column_types or {}
+        self.document_id_column = document_id_column
+        self.plans: Dict[Tuple[str, ...], List[Tuple[str, Callable[[Any], Any]]]] = {}
+        # Fields computed per row from (position, row), see derived_fields_for_schema.
+        self.derived_fields: Dict[str, Callable[[int, Any], Any]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent to --transform-processes workers: the settings, not the compiled
+        # plans or the (possibly unpicklable) encode function.
+        return {
+            "engine": self.engine,
+            "column_types": self.column_types,
+            "document_id_column": self.document_id_column,
+            "derived_fields": self.derived_fields,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(state["engine"], state["column_types"], state["document_id_column"])
+        self.derived_fields = state["derived_fields"]
+
+    def plan(self, columns: Tuple[str, ...]) -> List[Tuple[str, Callable[[Any], Any]]]:
+        plan = self.plans.get(columns)
+        if plan is None:
+            plan = [
+                (
+                    name,
+                    SPECIAL_COLUMN_CONVERTERS.get(name)
+                    or converter_for_sql_type(self.column_types.get(name)),
+                )
+                for name in columns
+                if name not in BANNED_FIELDS and name != "id"
+            ]
+            self.plans[columns] = plan
+        return plan
+
+    def encode_batch(self, batch: List[Any], position: int = 1) -> bytes:
+        return b"\n".join(self.encode_lines(batch, position))
+
+    def encode_lines(self, batch: List[Any], position: int = 1) -> List[bytes]:
+        """Encode one document per row; `position` is the 1-based stream position
+        of the first row, passed on to derived fields."""
+        if not batch:
+            return []
+        # Record batches come from one result set and share a layout; dict
+        # rows (Supabase, in-memory lists) are planned per distinct key set.
+        shared_plan = None
+        if not isinstance(batch[0], dict):
+            shared_plan = self.plan(tuple(batch[0].keys()))
+        dumps = self.dumps
+        doc_id_column = self.document_id_column
+        derived = list(self.derived_fields.items())
+        lines = []
+        for j, row in enumerate(batch):
+            plan = shared_plan or self.plan(tuple(row))
+            doc = {name: convert(row[name]) for name, convert in plan}
+            for name, derive in derived:
+                doc[name] = derive(position + j, row)
+            if doc_id_column:
+                doc_id = row.get(doc_id_column)
+                if doc_id is not None:
+                    doc["id"] = str(coerce_value(doc_id))
+            lines.append(dumps(doc))
+        return lines
+
+    def encode_columns(
+        self, columns: Tuple[str, ...], values: List[Tuple[Any, ...]], position: int = 1
+    ) -> List[bytes]:
+        """Like encode_lines for rows shipped column-wise: `values[i]` holds
+        column `columns[i]` for every row."""
+        plan = [(name, columns.index(name), convert) for name, convert in self.plan(columns)]
+        dumps = self.dumps
+        doc_id_index = (
+            columns.index(self.document_id_column)
+            if self.document_id_column in columns
+            else None
+        )
+        derived = list(self.derived_fields.items())
+        lines = []
+        for j, row in enumerate(zip(*values)):
+            doc = {name: convert(row[i]) for name, i, convert in plan}
+            if derived:
+                record = dict(zip(columns, row))
+                for name, derive in derived:
+                    doc[name] = derive(position + j, record)
+            if doc_id_index is not None and row[doc_id_index] is not None:
+                doc["id"] = str(coerce_value(row[doc_id_index]))
+            lines.append(dumps(doc))
+        return lines
+
+
+_process_encoder: Optional[DocumentEncoder] = None
+
+
+def init_transform_process(encoder: DocumentEncoder):
+    global _process_encoder
+    _process_encoder = encoder
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def encode_in_process(
+    columns: Optional[Tuple[str, ...]], values: Any, position: int
+) -> Tuple[List[bytes], float]:
+    """Worker side of TransformPool: returns the encoded lines and the CPU time spent."""
+    started = process_time()
+    if columns is None:
+        lines = _process_encoder.encode_lines(values, position)
+    else:
+        lines = _process_encoder.encode_columns(columns, values, position)
+    return lines, process_time() - started
+
+
+class TransformPool:
+    """Encode chunks in worker processes so conversion and JSON encoding use
+    more than the event loop's one core.
+
+    Rows travel column-wise (one tuple per column plus a shared header)
+    instead of as a dict per row. Dict rows whose keys differ within a chunk
+    are sent as they are.
+    """
+
+    def __init__(self, encoder: DocumentEncoder, processes: int):
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=get_context("spawn"),
+            initializer=init_transform_process,
+            initargs=(encoder,),
+        )
+        logger.info(f"Encoding documents in {processes} worker processes")
+
+    def submit(self, rows: List[Any], position: int) -> "asyncio.Future[Tuple[List[bytes], float]]":
+        columns: Optional[Tuple[str, ...]] = None
+        values: Any = rows
+        if rows:
+            keys = tuple(rows[0].keys())
+            if not isinstance(rows[0], dict) or all(tuple(row) == keys for row in rows):
+                columns = keys
+                values = list(zip(*(tuple(row.values()) for row in rows)))
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, encode_in_process, columns, values, position)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def get_document_encoder(config: SyncConfig) -> DocumentEncoder:
+    if config.document_encoder is None:
+        config.document_encoder = DocumentEncoder(
+            config.json_engine, config.column_types, config.document_id_column
+        )
+        logger.info(f"Serializing documents with {config.document_encoder.engine}")
+    return config.document_encoder
+
+
+TYPE_WIDENING_ORDER = ["bool", "int64", "float", "string"]
+
+
+def typesense_type_for_sql_type(sql_type: Optional[str]) -> Optional[str]:
+    """Map a catalog type to the Typesense type DocumentEncoder produces for it.
+
+    Returns None when the catalog alone cannot decide (e.g. bytea, interval,
+    custom types); those columns are typed from sampled values instead.
+    """
+    if not sql_type:
+        return None
+    if sql_type.endswith("[]"):
+        inner = typesense_type_for_sql_type(sql_type[:-2])
+        return f"{inner}[]" if inner and not inner.endswith("[]") else None
+    if sql_type.startswith(("smallint", "integer", "bigint")):
+        return "int64"
+    if sql_type.startswith(("real", "double precision", "numeric")):
+        return "float"
+    if sql_type == "boolean":
+        return "bool"
+    if sql_type.startswith(("text", "character", "uuid", "json")):
+        return "string"
+    if is_range_type(sql_type) or is_temporal_type(sql_type):
+        return "string"
+    return None
+
+
+def widen_type(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    """Smallest type holding both: bool < int64 < float < string, arrays only with arrays."""
+    if current is None or current == new:
+        return new
+    if new is None:
+        return current
+    if current.endswith("[]") or new.endswith("[]"):
+        if current.endswith("[]") and new.endswith("[]"):
+            return f"{widen_type(current[:-2], new[:-2])}[]"
+        return "string"
+    return max(current, new, key=TYPE_WIDENING_ORDER.index)
+
+
+class TypeWidener:
+    """Track the widest Typesense type seen per column over a stream of rows."""
+
+    def __init__(self):
+        self.types: Dict[str, Optional[str]] = {}
+
+    def observe(self, row: Any):
+        for name, value in row.items():
+            if value is None:
+                self.types.setdefault(name, None)
+                continue
+            value = coerce_value(value)
+            if isinstance(value, list):
+                inner = None
+                for item in value:
+                    inner = widen_type(inner, infer_typesense_type(item))
+                ts_type = f"{inner}[]" if inner else None
+            else:
+                ts_type = infer_typesense_type(value)
+            self.types[name] = widen_type(self.types.get(name), ts_type)
+
+
+def resolve_schema_fields(
+    columns: List[str], types: Dict[str, Optional[str]]
+) -> List[Dict[str, Any]]:
+    """Build optional Typesense fields for `columns`, letting COMMON_COLUMN_TYPES win."""
+    fields: List[Dict[str, Any]] = []
+    for name in columns:
+        if name in BANNED_FIELDS:
+            logger.info(f"Skipping banned field '{name}'")
+            continue
+        if name == "id":
+            continue
+        ts_type = COMMON_COLUMN_TYPES.get(name) or types.get(name)
+        if name in SPECIAL_COLUMN_CONVERTERS:
+            ts_type = "int64"
+        if not ts_type:
+            logger.warning(f"Skipping field '{name}' (type could not be inferred)")
+            continue
+        fields.append({"name": name, "type": ts_type, "optional": True})
+    if not fields:
+        raise ValueError("Could not infer any valid fields.")
+    return fields
+
+
+def build_typesense_schema(
+    collection_name: str, fields: List[Dict[str, Any]], fields_dir: Optional[str] = "."
+) -> Dict[str, Any]:
+    fields = [dict(f) for f in fields]
+    default_sort = next(
+        (f["name"] for f in fields if f["type"] in ["int64", "float", "string"]),
+        fields[0]["name"],
+    )
+
+    if fields_dir is not None:
+        try:
+            path = os.path.join(fields_dir, f"{collection_name}_fields.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                for field in fields:
+                    f.write(f"{field['name']}: {field['type']}\n")
+        except Exception as e:
+            logger.warning(f"Could not write fields to txt: {e}")
+
+    return {
+        "name": collection_name,
+        "fields": fields,
+        "default_sorting_field": default_sort,
+    }
+
+
+def infer_schema_fields_from_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    widener = TypeWidener()
+    for row in rows:
+        widener.observe(row)
+    return resolve_schema_fields(list(widener.types), widener.types)
+
+
+async def infer_schema_fields_from_postgres(
+    pool: asyncpg.Pool,
+    table_name: str,
+    column_types: Dict[str, str],
+    columns: List[str],
+    sample_rows: int,
+) -> List[Dict[str, Any]]:
+    """Type columns from the catalog; stream up to `sample_rows` rows for the rest.
+
+    Only the undecided columns are read, and only rows where at least one of
+    them is non-null, so a sparse column still gets typed from real values.
+    """
+    types = {name: typesense_type_for_sql_type(column_types.get(name)) for name in columns}
+    undecided = [
+        name
+        for name in columns
+        if types[name] is None
+        and name not in BANNED_FIELDS
+        and name not in COMMON_COLUMN_TYPES
+        and name not in SPECIAL_COLUMN_CONVERTERS
+    ]
+    if undecided and sample_rows > 0:
+        sanitized = validate_table_name(table_name)
+        logger.info(f"Sampling up to {sample_rows} rows to type {', '.join(undecided)}")
+        not_null = " OR ".join(f"{quote_ident(name)} IS NOT NULL" for name in undecided)
+        widener = TypeWidener()
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(
+                    f"SELECT {format_select_list(undecided)} FROM {sanitized}"
+                    f" WHERE {not_null} LIMIT {int(sample_rows)}"
+                ):
+                    widener.observe(row)
+        types.update(widener.types)
+    return resolve_schema_fields(columns, types)
+
+
+class SchemaCache:
+    """Inferred Typesense fields per table, reused while the column signature matches."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, table_name: str, signature: List[str]) -> Optional[List[Dict[str, Any]]]:
+        entry = self.entries.get(table_name)
+        if not entry or entry.get("signature") != signature:
+            return None
+        return entry["fields"]
+
+    def set(self, table_name: str, signature: List[str], fields: List[Dict[str, Any]]):
+        self.entries[table_name] = {
+            "signature": signature,
+            "fields": fields,
+            "inferred_at": datetime.utcnow().isoformat(),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+async def load_schema_fields(
+    config: SyncConfig,
+    signature: List[str],
+    infer: Callable[[], Awaitable[List[Dict[str, Any]]]],
+) -> List[Dict[str, Any]]:
+    """Return cached fields for the table, or infer them and update the cache."""
+    cache = SchemaCache(config.schema_cache) if config.schema_cache else None
+    if cache and not config.refresh_schema:
+        fields = cache.get(config.table_name, signature)
+        if fields is not None:
+            logger.info(f"Using cached schema for '{config.table_name}' from {config.schema_cache}")
+            return fields
+    fields = await infer()
+    if cache:
+        cache.set(config.table_name, signature, fields)
+    return fields
+
+
+def postgrest_headers(config: SyncConfig) -> Dict[str, str]:
+    return {
+        "apikey": config.supabase_anon_key,
+        "Authorization": f"Bearer {config.supabase_anon_key}",
+    }
+
+
+async def postgrest_get(
+    config: SyncConfig,
+    table: str,
+    params: Dict[str, str],
+    headers: Optional[Dict[str, str]] = None,
+    max_retries: int = 5,
+) -> httpx.Response:
+    """GET rows from the Supabase REST (PostgREST) endpoint of `table`.
+
+    5xx responses and network errors/timeouts are retried with exponential
+    backoff. A statement timeout is raised right away so the caller can
+    shrink the page instead. 416 (range past the end) is returned as is.
+    """
+    url = f"{config.supabase_url.rstrip('/')}/rest/v1/{table}"
+    request_headers = {**postgrest_headers(config), **(headers or {})}
+    client = get_http_client(config)
+    for attempt in range(1, max_retries + 1):
+        try:
+            response = await client.get(url, params=params, headers=request_headers)
+            if response.status_code < 500:
+                if response.status_code != 416:
+                    response.raise_for_status()
+                return response
+            if "57014" in response.text or "statement timeout" in response.text:
+                raise RuntimeError(f"statement timeout: {response.text}")
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            error = str(e) or type(e).__name__
+        if attempt == max_retries:
+            raise RuntimeError(
+                f"Supabase request for '{table}' failed after {attempt} attempts: {error}"
+            )
+        delay = min(30, 2**attempt)
+        logger.warning(f"Supabase request for '{table}' failed ({error}); retrying in {delay}s")
+        await asyncio.sleep(delay)
+
+
+async def fetch_sample_rows_from_supabase(
+    config: SyncConfig, table_name: str, limit: int
+) -> List[Dict[str, Any]]:
+    logger.info(f"Fetching {limit} sample rows from Supabase table '{table_name}'")
+    try:
+        response = await postgrest_get(
+            config, table_name, {"select": "*", "limit": str(max(1, limit))}
+        )
+        data = response.json() if response.status_code == 200 else []
+        if not data:
+            raise ValueError("No data found to infer schema.")
+        return data
+    except Exception as e:
+        logger.exception(f"Failed to fetch sample row: {e}")
+        raise
+
+
+class AdaptiveChunkSize:
+    """Grow the fetch size after a run of good pages and shrink it on timeouts."""
+
+    def __init__(self, chunk_size: int):
+        self.current = chunk_size
+        self.consecutive_successes = 0
+        self.prev_before_growth = chunk_size
+
+    def success(self):
+        self.consecutive_successes += 1
+        if self.consecutive_successes >= 10:
+            self.prev_before_growth = self.current
+            new_size = max(10, int(self.current * 1.5))
+            logger.info(f"Increasing chunk size to {new_size}")
+            self.current = new_size
+            self.consecutive_successes = 0
+
+    async def backoff(self, error: Exception) -> bool:
+        """Return True when the failed page should be retried with a smaller chunk."""
+        if (
+            "statement timeout" in str(error) or "read operation timed out" in str(error)
+        ) and self.current > 10:
+            # Undo the last growth step, or halve when the page never grew.
+            if self.prev_before_growth and self.prev_before_growth < self.current:
+                self.current = max(10, self.prev_before_growth)
+            else:
+                self.current = max(10, self.current // 2)
+            self.prev_before_growth = self.current
+            logger.warning(
+                f"Query timed out. Reducing chunk size to {self.current} and retrying. after 4 seconds"
+            )
+            await asyncio.sleep(12)
+            self.consecutive_successes = 0
+            return True
+        return False
+
+
+async def fetch_supabase_range(
+    config: SyncConfig, table: str, params: Dict[str, str], start: int, end: int
+) -> List[Dict[str, Any]]:
+    response = await postgrest_get(
+        config, table, params, headers={"Range-Unit": "items", "Range": f"{start}-{end}"}
+    )
+    return [] if response.status_code == 416 else response.json()
+
+
+async def iter_rows_from_supabase(
+    config: SyncConfig,
+    table: str,
+    chunk_size: int,
+    global_limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+    concurrency: int = 4,
+    order_column: Optional[str] = None,
+) -> AsyncIterator[RowChunk]:
+    """Read the table in `Range` windows, `concurrency` of them in flight at once.
+
+    Chunks are still yielded in offset order. The first page is read alone:
+    when it comes back short but the table continues, the server caps rows
+    per response (PostgREST max-rows) and that cap bounds every later page.
+    A page hitting a statement timeout is retried in smaller pieces. Windows
+    are only read in parallel when ordered by `order_column`; without an
+    order PostgREST pages in no stable order and windows could overlap.
+    """
+    params = {"select": ",".join(columns) if columns else "*"}
+    if order_column:
+        params["order"] = f"{order_column}.asc"
+    elif concurrency > 1:
+        logger.warning(
+            f"No order column for '{table}'; reading Range windows one at a time. "
+            "Pass --id-column to read them in parallel."
+        )
+        concurrency = 1
     logger.info("Starting to fetch data from Supabase...")
     pbar = tqdm(total=global_limit, desc="Fetching data")
-    current_chunk_size = chunk_size
-    consecutive_successes = 0
-    prev_chunk_before_growth = current_chunk_size
-    while True:
-        try:
-            if global_limit and offset >= global_limit:
+    sizer = AdaptiveChunkSize(chunk_size)
+    max_rows: Optional[int] = None
+
+    def window_end(start: int, size: int) -> int:
+        end = start + size - 1
+        return min(end, global_limit - 1) if global_limit else end
+
+    def page_size() -> int:
+        return min(sizer.current, max_rows) if max_rows else sizer.current
+
+    async def fetch_window(start: int, end: int) -> List[Dict[str, Any]]:
+        """Rows [start, end], stopping early at the end of the table."""
+        rows: List[Dict[str, Any]] = []
+        while start <= end:
+            piece_end = min(end, start + page_size() - 1)
+            try:
+                page = await fetch_supabase_range(config, table, params, start, piece_end)
+            except Exception as e:
+                if await sizer.backoff(e):
+                    continue
+                logger.error(f"Failed to fetch data: {e}")
+                raise
+            sizer.success()
+            rows.extend(page)
+            if len(page) < piece_end - start + 1:
                 break
-            resp = (
-                supabase.table(table)
-                .select("*")
-                .range(offset, offset + current_chunk_size - 1)
-                .execute()
-            )
-            data = resp.data
-            if not data:
+            start = piece_end + 1
+        return rows
+
+    pending: Deque[Tuple[int, asyncio.Task]] = deque()
+    try:
+        size = page_size()
+        rows = await fetch_window(0, window_end(0, size))
+        if not rows:
+            return
+        pbar.update(len(rows))
+        yield RowChunk(rows=rows)
+        next_start = len(rows)
+        if len(rows) < window_end(0, size) + 1:
+            more = await fetch_window(next_start, window_end(next_start, size))
+            if not more:
+                return
+            max_rows = len(rows)
+            logger.info(f"Server returns at most {max_rows} rows per request; using that window")
+            pbar.update(len(more))
+            yield RowChunk(rows=more)
+            next_start += len(more)
+            if len(more) < max_rows:
+                return
+
+        finished = False
+        while True:
+            while (
+                not finished
+                and len(pending) < max(1, concurrency)
+                and not (global_limit and next_start >= global_limit)
+            ):
+                end = window_end(next_start, page_size())
+                task = asyncio.create_task(fetch_window(next_start, end))
+                pending.append((end - next_start + 1, task))
+                next_start = end + 1
+            if not pending:
                 break
-            cleaned_data = [clean_record(row) for row in data]
-            all_data.extend(cleaned_data)
-            pbar.update(len(data))
-            offset += len(data)
-            if global_limit and len(all_data) >= global_limit:
-                all_data = all_data[:global_limit]
+            expected, task = pending.popleft()
+            rows = await task
+            if rows:
+                pbar.update(len(rows))
+                yield RowChunk(rows=rows)
+            if len(rows) < expected:
+                # End of the table: later windows can only be empty.
+                finished = True
+    finally:
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+        pbar.close()
+
+
+async def iter_rows_from_supabase_keyset(
+    config: SyncConfig,
+    table: str,
+    key_column: str,
+    chunk_size: int,
+    global_limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[RowChunk]:
+    """Page through the table with `key_column > last key`, one request at a time.
+
+    Pages stay cheap deep into the table, unlike large Range offsets.
+    """
+    if columns and key_column not in columns:
+        columns = columns + [key_column]
+    base = {"select": ",".join(columns) if columns else "*", "order": f"{key_column}.asc"}
+    logger.info(f"Starting to fetch data from Supabase, keyset on '{key_column}'...")
+    pbar = tqdm(total=global_limit, desc="Fetching data")
+    sizer = AdaptiveChunkSize(chunk_size)
+    last_key = None
+    fetched = 0
+    try:
+        while True:
+            if global_limit and fetched >= global_limit:
                 break
-            consecutive_successes += 1
-            if consecutive_successes >= 10:
-                prev_chunk_before_growth = current_chunk_size
-                new_size = max(10, int(current_chunk_size * 1.5))
-                logger.info(f"Increasing chunk size to {new_size}")
-                current_chunk_size = new_size
-                consecutive_successes = 0
-        except Exception as e:
-            if (
-                "statement timeout" in str(e) or "read operation timed out" in str(e)
-            ) and current_chunk_size > 10:
-                reduced = max(10, (prev_chunk_before_growth or current_chunk_size // 2))
-                current_chunk_size = reduced
-                logger.warning(
-                    f"Query timed out. Reducing chunk size to {current_chunk_size} and retrying. after 4 seconds"
-                )
-                await asyncio.sleep(12)
-                consecutive_successes = 0
-            else:
+            limit = sizer.current
+            if global_limit:
+                limit = min(limit, global_limit - fetched)
+            params = dict(base)
+            if last_key is not None:
+                params[key_column] = f"gt.{last_key}"
+            try:
+                rows = await fetch_supabase_range(config, table, params, 0, limit - 1)
+            except Exception as e:
+                if await sizer.backoff(e):
+                    continue
                 logger.error(f"Failed to fetch data: {e}")
                 raise
-    pbar.close()
-    return all_data
+            if not rows:
+                break
+            last_key = rows[-1][key_column]
+            fetched += len(rows)
+            pbar.update(len(rows))
+            yield RowChunk(rows=rows, last_key=last_key)
+            sizer.success()
+    finally:
+        pbar.close()
 
 
 async def fetch_sample_row_from_postgres(
-    pool: asyncpg.Pool, table_name: str
+    pool: asyncpg.Pool, table_name: str, columns: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     sanitized = validate_table_name(table_name)
     logger.info(f"Fetching sample row from Postgres table '{sanitized}'")
     try:
         async with pool.acquire() as conn:
-            row = await conn.fetchrow(f"SELECT * FROM {sanitized} LIMIT 1")
+            row = await conn.fetchrow(
+                f"SELECT {format_select_list(columns)} FROM {sanitized} LIMIT 1"
+            )
             if not row:
                 raise ValueError("No data found to infer schema.")
             return dict(row)
@@ -407,595 +1927,3199 @@ async def fetch_sample_row_from_postgres(
         raise
 
 
-async def fetch_all_rows_from_postgres(
-    pool: asyncpg.Pool, table_name: str, chunk_size: int, global_limit: Optional[int] = None
-) -> List[Dict[str, Any]]:
+async def iter_rows_from_postgres(
+    pool: asyncpg.Pool,
+    table_name: str,
+    chunk_size: int,
+    global_limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[RowChunk]:
     sanitized = validate_table_name(table_name)
-    all_data: List[Dict[str, Any]] = []
+    select_list = format_select_list(columns)
     offset = 0
     logger.info(f"Starting to fetch data from Postgres table '{sanitized}'...")
     pbar = tqdm(total=global_limit, desc="Fetching data")
-    current_chunk_size = chunk_size
-    consecutive_successes = 0
-    prev_chunk_before_growth = current_chunk_size
-    async with pool.acquire() as conn:
-        while True:
-            if global_limit and offset >= global_limit:
-                break
-            limit = current_chunk_size
-            if global_limit:
-                remaining = global_limit - offset
-                if remaining <= 0:
+    sizer = AdaptiveChunkSize(chunk_size)
+    try:
+        async with pool.acquire() as conn:
+            while True:
+                if global_limit and offset >= global_limit:
                     break
-                limit = min(limit, remaining)
-            query = f"SELECT * FROM {sanitized} OFFSET {offset} LIMIT {limit}"
-            try:
-                rows = await conn.fetch(query)
+                limit = sizer.current
+                if global_limit:
+                    limit = min(limit, global_limit - offset)
+                query = f"SELECT {select_list} FROM {sanitized} OFFSET {offset} LIMIT {limit}"
+                try:
+                    rows = await conn.fetch(query)
+                except Exception as e:
+                    if await sizer.backoff(e):
+                        continue
+                    logger.error(f"Postgres fetch failed: {e}")
+                    raise
                 if not rows:
                     break
-                cleaned_data = [clean_record(dict(row)) for row in rows]
-                all_data.extend(cleaned_data)
                 pbar.update(len(rows))
                 offset += len(rows)
-                if global_limit and len(all_data) >= global_limit:
-                    all_data = all_data[:global_limit]
+                yield RowChunk(rows=rows)
+                sizer.success()
+    finally:
+        pbar.close()
+
+
+async def resolve_key_column(
+    pool: asyncpg.Pool, table_name: str, id_column: Optional[str]
+) -> Tuple[str, str]:
+    """Return the (name, SQL type) of the column to page on.
+
+    Uses `id_column` when given, otherwise the table's single-column primary key.
+    """
+    sanitized = validate_table_name(table_name)
+    async with pool.acquire() as conn:
+        if id_column:
+            row = await conn.fetchrow(
+                """
+                SELECT a.attname, format_type(a.atttypid, a.atttypmod) AS type
+                FROM pg_attribute a
+                WHERE a.attrelid = $1::regclass AND a.attname = $2
+                  AND a.attnum > 0 AND NOT a.attisdropped
+                """,
+                sanitized,
+                id_column,
+            )
+            if not row:
+                raise ValueError(f"Column '{id_column}' not found on '{sanitized}'.")
+            return row["attname"], row["type"]
+        rows = await conn.fetch(
+            """
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod) AS type
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = $1::regclass AND i.indisprimary
+            """,
+            sanitized,
+        )
+    if len(rows) != 1:
+        raise ValueError(
+            f"Table '{sanitized}' has no single-column primary key; pass --id-column for keyset pagination."
+        )
+    return rows[0]["attname"], rows[0]["type"]
+
+
+async def iter_rows_from_postgres_keyset(
+    pool: asyncpg.Pool,
+    table_name: str,
+    key_column: str,
+    key_type: str,
+    chunk_size: int,
+    global_limit: Optional[int] = None,
+    start_after: Any = None,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[RowChunk]:
+    """Page through a table with `WHERE key > $1 ORDER BY key LIMIT $2`.
+
+    Each page is an index range scan, so late pages cost the same as early ones.
+    The last key is passed back as text and cast server side, which keeps the
+    query valid for any orderable key type (ints, uuids, timestamps, text).
+    """
+    sanitized = validate_table_name(table_name)
+    key = quote_ident(key_column)
+    if columns and key_column not in columns:
+        columns = columns + [key_column]
+    select_list = format_select_list(columns)
+    first_query = (
+        f"SELECT {select_list} FROM {sanitized} WHERE {key} IS NOT NULL ORDER BY {key} LIMIT $1"
+    )
+    next_query = (
+        f"SELECT {select_list} FROM {sanitized} "
+        f"WHERE {key} > $1::text::{key_type} ORDER BY {key} LIMIT $2"
+    )
+    fetched = 0
+    last_key = start_after
+    logger.info(
+        f"Starting keyset fetch from Postgres table '{sanitized}' on '{key_column}'"
+        + (f" after {last_key!r}" if last_key is not None else "")
+    )
+    pbar = tqdm(total=global_limit, desc="Fetching data")
+    sizer = AdaptiveChunkSize(chunk_size)
+    try:
+        async with pool.acquire() as conn:
+            while True:
+                if global_limit and fetched >= global_limit:
                     break
-                consecutive_successes += 1
-                if consecutive_successes >= 10:
-                    prev_chunk_before_growth = current_chunk_size
-                    new_size = max(10, int(current_chunk_size * 1.5))
-                    logger.info(f"Increasing chunk size to {new_size}")
-                    current_chunk_size = new_size
-                    consecutive_successes = 0
-            except Exception as e:
-                if (
-                    "statement timeout" in str(e)
-                    or "read operation timed out" in str(e)
-                ) and current_chunk_size > 10:
-                    reduced = max(10, (prev_chunk_before_growth or current_chunk_size // 2))
-                    current_chunk_size = reduced
-                    logger.warning(
-                        f"Query timed out. Reducing chunk size to {current_chunk_size} and retrying. after 4 seconds"
-                    )
-                    await asyncio.sleep(12)
-                    consecutive_successes = 0
-                    continue
-                logger.error(f"Postgres fetch failed: {e}")
-                raise
-    pbar.close()
-    return all_data
+                limit = sizer.current
+                if global_limit:
+                    limit = min(limit, global_limit - fetched)
+                try:
+                    if last_key is None:
+                        rows = await conn.fetch(first_query, limit)
+                    else:
+                        rows = await conn.fetch(next_query, str(last_key), limit)
+                except Exception as e:
+                    if await sizer.backoff(e):
+                        continue
+                    logger.error(f"Postgres fetch failed: {e}")
+                    raise
+                if not rows:
+                    break
+                last_key = rows[-1][key_column]
+                pbar.update(len(rows))
+                fetched += len(rows)
+                yield RowChunk(rows=rows, last_key=last_key)
+                if len(rows) < limit:
+                    break
+                sizer.success()
+    finally:
+        pbar.close()
 
 
-def finalize_schema(
-    schema: Dict[str, Any], data: List[Dict[str, Any]], id_column: Optional[str]
-) -> Dict[str, Any]:
-    fields = [field for field in schema["fields"] if field["name"] != "id"]
-    if not fields:
-        raise ValueError("Schema had no valid fields after removing 'id'.")
+async def fetch_table_columns(pool: asyncpg.Pool, table_name: str) -> List[Tuple[str, str]]:
+    """Return (name, SQL type) for every live column of the table, in table order."""
+    sanitized = validate_table_name(table_name)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT attname, format_type(atttypid, atttypmod) AS type
+            FROM pg_attribute
+            WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+            """,
+            sanitized,
+        )
+    return [(row["attname"], row["type"]) for row in rows]
 
-    formatted_fields: List[Dict[str, Any]] = []
-    for field in fields:
-        field_name = field["name"]
-        field_type = field["type"]
-        formatted_field = {
-            "name": field_name,
-            "type": field_type,
-            "optional": field.get("optional", True),
+
+async def iter_rows_from_postgres_cursor(
+    pool: asyncpg.Pool,
+    table_name: str,
+    chunk_size: int,
+    global_limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[RowChunk]:
+    """Stream the table through one server-side cursor.
+
+    Chunks carry the asyncpg Records themselves rather than per-row dicts,
+    and the whole read runs in a single transaction, i.e. against one
+    consistent snapshot without re-planning a query per page.
+    """
+    sanitized = validate_table_name(table_name)
+    query = f"SELECT {format_select_list(columns)} FROM {sanitized}"
+    if global_limit:
+        query += f" LIMIT {int(global_limit)}"
+    logger.info(f"Streaming '{sanitized}' through a server-side cursor")
+    pbar = tqdm(total=global_limit, desc="Fetching data")
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                cur = await conn.cursor(query)
+                while True:
+                    rows = await cur.fetch(chunk_size)
+                    if not rows:
+                        break
+                    pbar.update(len(rows))
+                    yield RowChunk(rows=rows)
+    finally:
+        pbar.close()
+
+
+class SyncState:
+    """High-water marks for incremental syncs, one per table/collection pair."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(table_name: str, collection_name: str) -> str:
+        return f"{table_name}->{collection_name}"
+
+    def get_mark(self, table_name: str, collection_name: str, column: str) -> Optional[str]:
+        entry = self.entries.get(self.key(table_name, collection_name))
+        if not entry:
+            return None
+        if entry.get("column") != column:
+            logger.warning(
+                f"Stored high-water mark is for column '{entry.get('column')}', not '{column}'; doing a full sync."
+            )
+            return None
+        return entry.get("mark")
+
+    def set_mark(self, table_name: str, collection_name: str, column: str, mark: Any):
+        self.entries[self.key(table_name, collection_name)] = {
+            "column": column,
+            "mark": str(mark),
+            "updated_at": datetime.utcnow().isoformat(),
         }
-        if "id" in field_name.lower() and field_type in ["int64", "string"]:
-            formatted_field["facet"] = True
-        formatted_fields.append(formatted_field)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+async def iter_rows_changed_since(
+    pool: asyncpg.Pool,
+    table_name: str,
+    updated_column: str,
+    updated_type: str,
+    key_column: str,
+    key_type: str,
+    since: Optional[str],
+    chunk_size: int,
+    global_limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[RowChunk]:
+    """Page through rows with `updated_column > since`, ordered by (updated, key).
+
+    Paging on the (updated, key) pair keeps pages stable when many rows share
+    one timestamp. Each chunk's last_key is the newest updated value seen so far.
+    """
+    sanitized = validate_table_name(table_name)
+    updated = quote_ident(updated_column)
+    key = quote_ident(key_column)
+    for required in (updated_column, key_column):
+        if columns and required not in columns:
+            columns = columns + [required]
+    select_list = format_select_list(columns)
+    order = f"ORDER BY {updated}, {key}"
+    if since is None:
+        first_query = f"SELECT {select_list} FROM {sanitized} WHERE {updated} IS NOT NULL {order} LIMIT $1"
+    else:
+        first_query = (
+            f"SELECT {select_list} FROM {sanitized} "
+            f"WHERE {updated} > $2::text::{updated_type} {order} LIMIT $1"
+        )
+    next_query = (
+        f"SELECT {select_list} FROM {sanitized} "
+        f"WHERE ({updated}, {key}) > ($2::text::{updated_type}, $3::text::{key_type}) "
+        f"{order} LIMIT $1"
+    )
+    logger.info(
+        f"Fetching rows of '{sanitized}' with {updated_column} > {since!r}"
+        if since is not None
+        else f"No high-water mark for '{sanitized}'; fetching every row"
+    )
+    fetched = 0
+    last = None
+    pbar = tqdm(total=global_limit, desc="Fetching changes")
+    sizer = AdaptiveChunkSize(chunk_size)
+    try:
+        async with pool.acquire() as conn:
+            while True:
+                if global_limit and fetched >= global_limit:
+                    break
+                limit = sizer.current
+                if global_limit:
+                    limit = min(limit, global_limit - fetched)
+                try:
+                    if last is None:
+                        args = [limit] if since is None else [limit, since]
+                        rows = await conn.fetch(first_query, *args)
+                    else:
+                        rows = await conn.fetch(next_query, limit, str(last[0]), str(last[1]))
+                except Exception as e:
+                    if await sizer.backoff(e):
+                        continue
+                    logger.error(f"Postgres fetch failed: {e}")
+                    raise
+                if not rows:
+                    break
+                last = (rows[-1][updated_column], rows[-1][key_column])
+                pbar.update(len(rows))
+                fetched += len(rows)
+                yield RowChunk(rows=rows, last_key=last[0])
+                if len(rows) < limit:
+                    break
+                sizer.success()
+    finally:
+        pbar.close()
+
+
+def is_tombstone(value: Any) -> bool:
+    return value is not None and value is not False
+
+
+def typesense_id_filter(ids: List[str]) -> str:
+    return "id:[" + ",".join(f"`{doc_id}`" for doc_id in ids) + "]"
+
+
+async def delete_typesense_documents(
+    ids: List[str], collection_name: str, config: SyncConfig, chunk: int = 250
+) -> int:
+    """Delete documents by id in filter_by batches; returns the number deleted."""
+    index = get_digest_index(config)
+    if index is not None:
+        index.forget(collection_name, ids)
+    host = config.typesense_host.rstrip("/")
+    deleted = 0
+    client = get_http_client(config)
+    for i in range(0, len(ids), chunk):
+        response = await client.delete(
+            f"{host}/collections/{collection_name}/documents",
+            params={"filter_by": typesense_id_filter(ids[i : i + chunk])},
+            headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to delete documents: {response.status_code} - {response.text}"
+            )
+            continue
+        deleted += response.json().get("num_deleted", 0)
+    return deleted
+
+
+async def delete_missing_documents(
+    pool: asyncpg.Pool, table_name: str, key_column: str, collection_name: str, config: SyncConfig
+) -> int:
+    """Delete Typesense documents whose id no longer exists in the source table.
+
+    Holds every source id in memory as a string, so expect a few hundred MB on
+    tables with tens of millions of rows.
+    """
+    sanitized = validate_table_name(table_name)
+    source_ids = set()
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            async for row in conn.cursor(
+                f"SELECT {quote_ident(key_column)} FROM {sanitized}", prefetch=10000
+            ):
+                source_ids.add(str(coerce_value(row[0])))
+    logger.info(f"Loaded {len(source_ids)} source ids for delete diff")
+
+    stale: List[str] = []
+    host = config.typesense_host.rstrip("/")
+    client = get_http_client(config)
+    async with client.stream(
+        "GET",
+        f"{host}/collections/{collection_name}/documents/export",
+        params={"include_fields": "id"},
+        headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+        timeout=httpx.Timeout(config.http_timeout, read=None),
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            doc_id = json.loads(line).get("id")
+            if doc_id is not None and doc_id not in source_ids:
+                stale.append(doc_id)
+    if not stale:
+        return 0
+    logger.info(f"Deleting {len(stale)} documents missing from '{sanitized}'")
+    return await delete_typesense_documents(stale, collection_name, config)
+
+
+class PgOutputDecoder:
+    """Decode pgoutput (protocol v1) messages into (action, key) pairs for one table.
+
+    Only the key column is read from the WAL; changed rows are re-read from the
+    table so documents are encoded exactly like a bulk load, including
+    unchanged TOASTed columns that pgoutput leaves out of updates.
+    """
+
+    def __init__(self, table_name: str, key_column: str):
+        schema, _, name = table_name.rpartition(".")
+        self.schema = schema or None
+        self.name = name
+        self.key_column = key_column
+        self.relations: Dict[int, Optional[int]] = {}
+
+    @staticmethod
+    def _string(data: bytes, pos: int) -> Tuple[str, int]:
+        end = data.index(b"\0", pos)
+        return data[pos:end].decode(), end + 1
+
+    @staticmethod
+    def _tuple(data: bytes, pos: int) -> Tuple[List[Optional[str]], int]:
+        (ncols,) = struct.unpack_from("!h", data, pos)
+        pos += 2
+        values: List[Optional[str]] = []
+        for _ in range(ncols):
+            kind = data[pos : pos + 1]
+            pos += 1
+            if kind == b"t":
+                (length,) = struct.unpack_from("!i", data, pos)
+                pos += 4
+                values.append(data[pos : pos + length].decode())
+                pos += length
+            else:
+                values.append(None)
+        return values, pos
+
+    def decode(self, data: bytes) -> Optional[Tuple[str, str]]:
+        kind = data[:1]
+        if kind == b"R":
+            (relid,) = struct.unpack_from("!I", data, 1)
+            namespace, pos = self._string(data, 5)
+            name, pos = self._string(data, pos)
+            pos += 1  # replica identity setting
+            (ncols,) = struct.unpack_from("!h", data, pos)
+            pos += 2
+            key_index = None
+            for idx in range(ncols):
+                pos += 1  # flags
+                column, pos = self._string(data, pos)
+                pos += 8  # type oid, typmod
+                if column == self.key_column:
+                    key_index = idx
+            matches = name == self.name and (self.schema is None or namespace == self.schema)
+            self.relations[relid] = key_index if matches else None
+            return None
+        if kind == b"T":
+            logger.warning("Source table was truncated; run a full sync to rebuild the collection.")
+            return None
+        if kind not in (b"I", b"U", b"D"):
+            return None
+        (relid,) = struct.unpack_from("!I", data, 1)
+        key_index = self.relations.get(relid)
+        if key_index is None:
+            return None
+        pos = 5
+        if kind == b"U" and data[pos : pos + 1] in (b"K", b"O"):
+            _, pos = self._tuple(data, pos + 1)
+        values, _ = self._tuple(data, pos + 1)
+        key = values[key_index]
+        if key is None:
+            return None
+        return ("delete" if kind == b"D" else "upsert"), key
+
+
+def decode_wal2json_change(data: str, key_column: str) -> Optional[Tuple[str, str]]:
+    """Decode one wal2json format-version 2 change into (action, key)."""
+    # Numbers keep their SQL text ("1.50", not 1.5) so keys compare like key::text.
+    change = json.loads(data, parse_float=str)
+    action = change.get("action")
+    if action == "T":
+        logger.warning("Source table was truncated; run a full sync to rebuild the collection.")
+        return None
+    if action not in ("I", "U", "D"):
+        return None
+    columns = change.get("identity") if action == "D" else change.get("columns")
+    for column in columns or []:
+        if column["name"] == key_column and column["value"] is not None:
+            return ("delete" if action == "D" else "upsert"), str(column["value"])
+    return None
+
+
+async def prepare_replication(pool: asyncpg.Pool, config: SyncConfig) -> bool:
+    """Create the publication and replication slot if needed; True when the slot is new.
+
+    The publication is created first so that every change after the slot's
+    consistent point is published.
+    """
+    sanitized = validate_table_name(config.table_name)
+    async with pool.acquire() as conn:
+        if config.follow_plugin == "pgoutput":
+            exists = await conn.fetchval(
+                "SELECT 1 FROM pg_publication WHERE pubname = $1", config.publication_name
+            )
+            if not exists:
+                logger.info(f"Creating publication '{config.publication_name}' for '{sanitized}'")
+                await conn.execute(
+                    f"CREATE PUBLICATION {quote_ident(config.publication_name)} FOR TABLE {sanitized}"
+                )
+        exists = await conn.fetchval(
+            "SELECT 1 FROM pg_replication_slots WHERE slot_name = $1", config.slot_name
+        )
+        if exists:
+            return False
+        logger.info(f"Creating logical replication slot '{config.slot_name}' ({config.follow_plugin})")
+        await conn.execute(
+            "SELECT pg_create_logical_replication_slot($1, $2)",
+            config.slot_name,
+            config.follow_plugin,
+        )
+        return True
+
+
+FOLLOW_KEY_ALIAS = "__follow_key"
+
+
+async def follow_changes(
+    pool: asyncpg.Pool,
+    config: SyncConfig,
+    key_column: str,
+    key_type: str,
+    columns: Optional[List[str]],
+):
+    """Tail the replication slot forever, applying each micro-batch to Typesense.
+
+    Changes are peeked, coalesced per key (last change wins), re-read from the
+    table, upserted or deleted, and only then is the slot advanced, so a crash
+    replays the micro-batch instead of losing it. Keys are matched in their
+    SQL text form, and upserts are numbered after the highest row_id already
+    in the collection so they never reuse the sort values of the bulk load.
+    """
+    sanitized = validate_table_name(config.table_name)
+    if columns and key_column not in columns:
+        columns = columns + [key_column]
+    key = quote_ident(key_column)
+    select_rows = (
+        f"SELECT {key}::text AS {FOLLOW_KEY_ALIAS}, {format_select_list(columns)} "
+        f"FROM {sanitized} WHERE {key} = ANY($1::text[]::{key_type}[])"
+    )
+    # Canonical text and typed value of WAL keys, for rows that are gone.
+    normalize_keys = f"SELECT k::text AS key_text, k AS key FROM unnest($1::text[]::{key_type}[]) AS k"
+    next_position = 0
+    if "row_id" in get_document_encoder(config).derived_fields:
+        next_position = await fetch_max_row_id(config, config.collection_name)
+    if config.follow_plugin == "pgoutput":
+        peek = (
+            "SELECT lsn::text, data FROM pg_logical_slot_peek_binary_changes("
+            "$1, NULL, $2, 'proto_version', '1', 'publication_names', $3)"
+        )
+        peek_args = [config.slot_name, config.follow_max_changes, config.publication_name]
+    else:
+        table = sanitized if "." in sanitized else f"*.{sanitized}"
+        peek = (
+            "SELECT lsn::text, data FROM pg_logical_slot_peek_changes("
+            "$1, NULL, $2, 'format-version', '2', 'add-tables', $3)"
+        )
+        peek_args = [config.slot_name, config.follow_max_changes, table]
+
+    logger.info(f"Following changes on '{sanitized}' through slot '{config.slot_name}'")
+    while True:
+        async with pool.acquire() as conn:
+            changes = await conn.fetch(peek, *peek_args)
+        if not changes:
+            await asyncio.sleep(config.follow_interval)
+            continue
+
+        decoder = PgOutputDecoder(sanitized, key_column)
+        pending: Dict[str, str] = {}
+        for change in changes:
+            if config.follow_plugin == "pgoutput":
+                decoded = decoder.decode(change["data"])
+            else:
+                decoded = decode_wal2json_change(change["data"], key_column)
+            if decoded:
+                action, key = decoded
+                pending[key] = action
+        last_lsn = changes[-1]["lsn"]
+
+        ok = True
+        if pending:
+            upsert_keys = [key for key, action in pending.items() if action == "upsert"]
+            rows: List[Any] = []
+            found = set()
+            async with pool.acquire() as conn:
+                if upsert_keys:
+                    for record in await conn.fetch(select_rows, upsert_keys):
+                        row = dict(record)
+                        found.add(row.pop(FOLLOW_KEY_ALIAS))
+                        rows.append(row)
+                typed = await conn.fetch(normalize_keys, list(pending))
+            # Rows updated and then deleted within the window no longer exist.
+            delete_keys = [
+                str(coerce_value(record["key"]))
+                for record in typed
+                if record["key_text"] not in found
+            ]
+            base_position = next_position
+            next_position += len(rows)
+            results: List[bool] = []
+
+            async def batch_starts():
+                for start in range(0, len(rows), config.batch_size):
+                    yield start
+
+            async def handle(start: int):
+                results.append(
+                    await import_batch(
+                        rows[start : start + config.batch_size],
+                        base_position + start,
+                        config.collection_name,
+                        config,
+                    )
+                )
+
+            await run_worker_pool(
+                batch_starts(), handle, config.num_workers, config.num_workers * 2
+            )
+            ok = all(results)
+            if delete_keys:
+                await delete_typesense_documents(delete_keys, config.collection_name, config)
+            logger.info(
+                f"Applied {len(rows)} upserts and {len(delete_keys)} deletes up to LSN {last_lsn}"
+            )
+        if not ok:
+            logger.warning("Micro-batch had failed imports; retrying it before advancing the slot.")
+            await asyncio.sleep(config.follow_interval)
+            continue
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "SELECT pg_replication_slot_advance($1, $2::pg_lsn)", config.slot_name, last_lsn
+            )
+
+
+INTEGER_KEY_TYPES = {"smallint", "integer", "bigint"}
+
+
+@dataclass
+class KeyRange:
+    partition: int
+    lower: Any
+    upper: Any = None
+
+
+async def plan_key_partitions(
+    conn, table_name: str, key_column: str, partitions: int
+) -> List[KeyRange]:
+    """Split [min, max] of an integer key into equally wide half-open ranges."""
+    key = quote_ident(key_column)
+    row = await conn.fetchrow(f"SELECT min({key}) AS lo, max({key}) AS hi FROM {table_name}")
+    lo, hi = row["lo"], row["hi"]
+    if lo is None:
+        return []
+    step = max(1, -(-(hi - lo + 1) // partitions))
+    ranges = []
+    for idx in range(partitions):
+        lower = lo + idx * step
+        if lower > hi:
+            break
+        ranges.append(KeyRange(idx, lower, lower + step))
+    # Leave the last range open so rows inserted past max() during the run are read.
+    ranges[-1].upper = None
+    return ranges
+
+
+async def plan_ctid_partitions(conn, table_name: str, partitions: int) -> List[KeyRange]:
+    """Split the heap into contiguous page ranges for tables without a usable key."""
+    pages = await conn.fetchval(
+        "SELECT (pg_relation_size($1::regclass) / current_setting('block_size')::int)::bigint",
+        table_name,
+    )
+    step = max(1, -(-pages // partitions))
+    ranges = [
+        KeyRange(idx, idx * step, (idx + 1) * step)
+        for idx in range(partitions)
+        if idx * step < max(pages, 1)
+    ]
+    ranges[-1].upper = None
+    return ranges
+
+
+async def iter_key_range(
+    conn,
+    table_name: str,
+    key_column: str,
+    key_range: KeyRange,
+    sizer: AdaptiveChunkSize,
+    select_list: str = "*",
+) -> AsyncIterator[List[asyncpg.Record]]:
+    key = quote_ident(key_column)
+    upper_clause = f" AND {key} < $3" if key_range.upper is not None else ""
+    first_query = (
+        f"SELECT {select_list} FROM {table_name} "
+        f"WHERE {key} >= $1{upper_clause} ORDER BY {key} LIMIT $2"
+    )
+    next_query = (
+        f"SELECT {select_list} FROM {table_name} "
+        f"WHERE {key} > $1{upper_clause} ORDER BY {key} LIMIT $2"
+    )
+    last_key = None
+    while True:
+        limit = sizer.current
+        args = [key_range.lower if last_key is None else last_key, limit]
+        if key_range.upper is not None:
+            args.append(key_range.upper)
+        try:
+            rows = await conn.fetch(first_query if last_key is None else next_query, *args)
+        except Exception as e:
+            if await sizer.backoff(e):
+                continue
+            raise
+        if not rows:
+            return
+        last_key = rows[-1][key_column]
+        yield rows
+        if len(rows) < limit:
+            return
+        sizer.success()
+
+
+async def iter_ctid_range(
+    conn,
+    table_name: str,
+    key_range: KeyRange,
+    sizer: AdaptiveChunkSize,
+    select_list: str = "*",
+) -> AsyncIterator[List[asyncpg.Record]]:
+    rows_per_page = await conn.fetchval(
+        """
+        SELECT CASE WHEN relpages > 0 THEN greatest(reltuples / relpages, 1) ELSE 100 END
+        FROM pg_class WHERE oid = $1::regclass
+        """,
+        table_name,
+    )
+    page = key_range.lower
+    while key_range.upper is None or page < key_range.upper:
+        window = max(1, int(sizer.current / rows_per_page))
+        end = page + window
+        if key_range.upper is not None:
+            end = min(end, key_range.upper)
+        try:
+            rows = await conn.fetch(
+                f"SELECT {select_list} FROM {table_name} WHERE ctid >= $1::tid AND ctid < $2::tid",
+                (page, 0),
+                (end, 0),
+            )
+        except Exception as e:
+            if await sizer.backoff(e):
+                continue
+            raise
+        if rows:
+            yield rows
+            sizer.success()
+        elif key_range.upper is None:
+            # Open-ended last range: stop once we run past the end of the heap.
+            pages = await conn.fetchval(
+                "SELECT (pg_relation_size($1::regclass) / current_setting('block_size')::int)::bigint",
+                table_name,
+            )
+            if end >= pages:
+                return
+        page = end
+
+
+async def iter_rows_from_postgres_partitioned(
+    pool: asyncpg.Pool,
+    table_name: str,
+    chunk_size: int,
+    partitions: int,
+    global_limit: Optional[int] = None,
+    id_column: Optional[str] = None,
+    order: str = "any",
+    partition_progress: bool = False,
+    columns: Optional[List[str]] = None,
+    key_ranges: Optional[List[KeyRange]] = None,
+) -> AsyncIterator[RowChunk]:
+    """Read key (or ctid page) ranges of a table concurrently, one pooled connection each.
+
+    With order="any" chunks are yielded as soon as any partition produces them.
+    With order="key" partitions are drained in range order while later ones
+    keep prefetching into their own small buffers. `key_ranges` replaces the
+    planned split, e.g. the remaining ranges of a resumed run.
+    """
+    sanitized = validate_table_name(table_name)
+    key_column = None
+    try:
+        key_column, key_type = await resolve_key_column(pool, sanitized, id_column)
+        if key_type not in INTEGER_KEY_TYPES:
+            logger.info(f"Key '{key_column}' is {key_type}; partitioning on ctid pages instead.")
+            key_column = None
+    except ValueError as e:
+        logger.info(f"{e} Partitioning on ctid pages instead.")
+
+    if not key_column and key_ranges is None:
+        async with pool.acquire() as conn:
+            server_version = conn.get_server_version()
+        if server_version.major < 14:
+            # Without TID range scans every ctid window is a full sequential scan,
+            # so N partitions would read the table N times over.
+            logger.warning(
+                f"PostgreSQL {server_version.major} has no TID range scan and '{sanitized}' has "
+                "no integer key to partition on; reading it through a single cursor instead. "
+                "Pass an integer --id-column to read in parallel."
+            )
+            async for chunk in iter_rows_from_postgres_cursor(
+                pool, sanitized, chunk_size, global_limit, columns=columns
+            ):
+                yield chunk
+            return
+
+    if key_column and columns and key_column not in columns:
+        columns = columns + [key_column]
+    select_list = format_select_list(columns)
+
+    if key_ranges is not None:
+        ranges = key_ranges
+    else:
+        async with pool.acquire() as conn:
+            if key_column:
+                ranges = await plan_key_partitions(conn, sanitized, key_column, partitions)
+            else:
+                ranges = await plan_ctid_partitions(conn, sanitized, partitions)
+    if not ranges:
+        return
+    logger.info(
+        f"Fetching '{sanitized}' in {len(ranges)} partitions on "
+        f"{key_column or 'ctid'}: "
+        + ", ".join(f"[{r.lower}, {'' if r.upper is None else r.upper})" for r in ranges)
+    )
+
+    done = object()
+    if order == "key":
+        queues = [asyncio.Queue(maxsize=2) for _ in ranges]
+    else:
+        shared: asyncio.Queue = asyncio.Queue(maxsize=2 * len(ranges))
+        queues = [shared for _ in ranges]
+    bars = []
+    if partition_progress:
+        bars = [
+            tqdm(desc=f"Partition {r.partition}", position=r.partition + 1, leave=False)
+            for r in ranges
+        ]
+
+    async def read(key_range: KeyRange):
+        out = queues[key_range.partition]
+        try:
+            async with pool.acquire() as conn:
+                sizer = AdaptiveChunkSize(chunk_size)
+                if key_column:
+                    pages = iter_key_range(
+                        conn, sanitized, key_column, key_range, sizer, select_list
+                    )
+                else:
+                    pages = iter_ctid_range(conn, sanitized, key_range, sizer, select_list)
+                async for rows in pages:
+                    chunk = RowChunk(
+                        rows=rows,
+                        last_key=rows[-1][key_column] if key_column else None,
+                        partition=key_range.partition,
+                    )
+                    if bars:
+                        bars[key_range.partition].update(len(rows))
+                    await out.put(chunk)
+        except Exception as e:
+            logger.error(f"Partition {key_range.partition} fetch failed: {e}")
+            await out.put(e)
+            return
+        await out.put(done)
+
+    tasks = [asyncio.create_task(read(r)) for r in ranges]
+    pbar = tqdm(total=global_limit, desc="Fetching data", position=0)
+    fetched = 0
+    try:
+        if order == "key":
+            sources = [(q, 1) for q in queues]
+        else:
+            sources = [(queues[0], len(ranges))]
+        for queue, expected_done in sources:
+            finished = 0
+            while finished < expected_done:
+                item = await queue.get()
+                if item is done:
+                    finished += 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                if global_limit:
+                    item.rows = item.rows[: global_limit - fetched]
+                fetched += len(item.rows)
+                pbar.update(len(item.rows))
+                yield item
+                if global_limit and fetched >= global_limit:
+                    return
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for bar in bars:
+            bar.close()
+        pbar.close()
+
+
+class KeysetCursor:
+    """Persist the last key whose rows have all been imported.
+
+    Chunks finish out of order across import workers, so the file only moves
+    forward once every earlier chunk has been fully indexed. A chunk with a
+    failed batch stops the cursor so a rerun picks those rows up again.
+    The number of rows before the cursor is kept too, so a resumed run goes
+    on numbering rows (`start_offset`) where the last one stopped.
+    """
+
+    def __init__(self, path: str, table_name: str, key_column: str):
+        self.path = path
+        self.table_name = table_name
+        self.key_column = key_column
+        self.pending: Dict[int, int] = {}
+        self.last_keys: Dict[int, Any] = {}
+        self.end_offsets: Dict[int, int] = {}
+        self.start_offset = 0
+        self.failed: set = set()
+        self.next_seq = 0
+
+    def load(self) -> Any:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("table") != self.table_name or state.get("column") != self.key_column:
+            logger.warning(
+                f"Ignoring cursor file '{self.path}' written for {state.get('table')}.{state.get('column')}"
+            )
+            return None
+        self.start_offset = state.get("rows", 0)
+        return state.get("last_key")
+
+    def register(
+        self, seq: int, last_key: Any, num_batches: int, partition: int = 0, offset: int = 0, rows: int = 0
+    ):
+        self.pending[seq] = num_batches
+        self.last_keys[seq] = last_key
+        self.end_offsets[seq] = offset + rows
+        self._advance()
+
+    def batch_done(self, seq: int, ok: bool):
+        if not ok:
+            self.failed.add(seq)
+        self.pending[seq] -= 1
+        self._advance()
+
+    def _advance(self):
+        last_key = None
+        rows = 0
+        while self.pending.get(self.next_seq) == 0 and self.next_seq not in self.failed:
+            self.pending.pop(self.next_seq)
+            last_key = self.last_keys.pop(self.next_seq)
+            rows = self.end_offsets.pop(self.next_seq)
+            self.next_seq += 1
+        if last_key is not None:
+            self._write(last_key, rows)
+
+    def _write(self, last_key: Any, rows: int):
+        state = {
+            "table": self.table_name,
+            "column": self.key_column,
+            "last_key": last_key if isinstance(last_key, int) else str(last_key),
+            "rows": rows,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:
+            logger.warning(f"Could not write cursor file: {exc}")
+
+
+def journal_key(key: Any) -> Any:
+    return key if key is None or isinstance(key, int) else str(key)
+
+
+class CheckpointJournal:
+    """Append-only JSONL journal of a run, fsynced line by line, for --resume.
+
+    The first line describes the run: table, collection, key column and
+    partition ranges. A `fetched` line records each chunk handed to the
+    import workers: its partition and key range (lo, hi], with lo being the
+    previous chunk's last key. An `acked` line follows once Typesense has
+    accepted every batch of that chunk.
+
+    On resume, each partition restarts after its unbroken run of
+    acknowledged chunks. Chunks acknowledged beyond a gap are filtered out
+    again when re-read (integer keys only). A chunk with a failed batch is
+    never acknowledged, so its range is read again.
+    """
+
+    def __init__(self, path: str, table_name: str, collection_name: str, key_column: str):
+        self.path = path
+        self.table_name = table_name
+        self.collection_name = collection_name
+        self.key_column = key_column
+        self.file: Any = None
+        self.header: Dict[str, Any] = {}
+        self.completed = False
+        self.frontier: Dict[int, Any] = {}
+        self.skip_ranges: Dict[int, List[Tuple[Any, Any]]] = {}
+        self.start_offset = 0
+        self.chunks: Dict[int, Dict[str, Any]] = {}
+        self.last_keys: Dict[int, Any] = {}
+        self.failed = False
+        self.fetched_all = False
+
+    def load(self) -> bool:
+        """Read the journal of an earlier run; False when there is none to resume."""
+        if not os.path.exists(self.path):
+            return False
+        acked: Dict[int, Dict[Any, Any]] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write.
+                    break
+                kind = entry.get("type")
+                if kind == "run":
+                    self.header = entry
+                elif kind == "fetched":
+                    self.start_offset = max(self.start_offset, entry["offset"] + entry["rows"])
+                elif kind == "acked":
+                    acked.setdefault(entry["partition"], {})[entry["lo"]] = entry["hi"]
+                elif kind == "complete":
+                    self.completed = True
+        expected = (self.table_name, self.collection_name, self.key_column)
+        found = (self.header.get("table"), self.header.get("collection"), self.header.get("key"))
+        if found != expected:
+            raise ValueError(
+                f"Checkpoint '{self.path}' is for {found[0]} -> {found[1]} on {found[2]}, "
+                f"not {expected[0]} -> {expected[1]} on {expected[2]}"
+            )
+        for partition, ranges in acked.items():
+            key = None
+            while key in ranges:
+                key = ranges.pop(key)
+            self.frontier[partition] = key
+            self.skip_ranges[partition] = sorted(
+                (lo, hi)
+                for lo, hi in ranges.items()
+                if isinstance(hi, int) and (lo is None or isinstance(lo, int))
+                and (key is None or hi > key)
+            )
+        return True
+
+    def start(self, header: Dict[str, Any], resuming: bool):
+        self.last_keys = dict(self.frontier)
+        self.file = open(self.path, "a" if resuming else "w", encoding="utf-8")
+        if not resuming:
+            self.append({"type": "run", **header, "started_at": datetime.utcnow().isoformat()})
+
+    def append(self, entry: Dict[str, Any]):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def pending_rows(self, chunk: RowChunk) -> List[Any]:
+        """Rows of `chunk` outside the ranges acknowledged before the resume."""
+        ranges = self.skip_ranges.get(chunk.partition)
+        if not ranges:
+            return chunk.rows
+        column = self.key_column
+        return [
+            row
+            for row in chunk.rows
+            if not any((lo is None or lo < row[column]) and row[column] <= hi for lo, hi in ranges)
+        ]
+
+    def register(
+        self, seq: int, last_key: Any, num_batches: int, partition: int = 0, offset: int = 0, rows: int = 0
+    ):
+        lo = self.last_keys.get(partition)
+        hi = journal_key(last_key) if last_key is not None else lo
+        self.last_keys[partition] = hi
+        self.chunks[seq] = {
+            "partition": partition, "lo": lo, "hi": hi, "pending": num_batches, "failed": False
+        }
+        self.append(
+            {
+                "type": "fetched",
+                "partition": partition,
+                "lo": lo,
+                "hi": hi,
+                "offset": offset,
+                "rows": rows,
+            }
+        )
+        if num_batches == 0:
+            self._finish(seq)
+
+    def batch_done(self, seq: int, ok: bool):
+        chunk = self.chunks[seq]
+        chunk["failed"] = chunk["failed"] or not ok
+        chunk["pending"] -= 1
+        if chunk["pending"] == 0:
+            self._finish(seq)
+
+    def _finish(self, seq: int):
+        chunk = self.chunks.pop(seq)
+        if chunk["failed"]:
+            self.failed = True
+            return
+        self.append(
+            {"type": "acked", "partition": chunk["partition"], "lo": chunk["lo"], "hi": chunk["hi"]}
+        )
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.fetched_all and not self.chunks and not self.failed:
+            self.append({"type": "complete"})
+        self.file.close()
+        self.file = None
+
+
+class Source(ABC):
+    """Where rows come from: schema fields first, then rows in RowChunk batches.
+
+    `open()` does whatever I/O the source needs up front (connections,
+    sampling); `chunks()` is then iterated once. `cursor`/`resuming` are set
+    by sources that can continue an interrupted run.
+    """
+
+    cursor: Optional[Union[KeysetCursor, CheckpointJournal]] = None
+    resuming: bool = False
+
+    def __init__(self, config: SyncConfig):
+        self.config = config
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def fields(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def chunks(self) -> AsyncIterator[RowChunk]:
+        ...
+
+    async def __aenter__(self) -> "Source":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class PostgresSource(Source):
+    def __init__(self, config: SyncConfig):
+        super().__init__(config)
+        self.pool: Optional[asyncpg.Pool] = None
+        self.column_types: Dict[str, str] = {}
+        self.columns: List[str] = []
+        self.key_column: Optional[str] = None
+        self.key_type: Optional[str] = None
+        self.start_after: Any = None
+        self.journal: Optional[CheckpointJournal] = None
+        self.key_ranges: Optional[List[KeyRange]] = None
+
+    async def open(self):
+        config = self.config
+        if config.shared_pool is not None:
+            self.pool = config.shared_pool
+        else:
+            self.pool = await asyncpg.create_pool(
+                config.pg_uri, min_size=1, max_size=max(4, config.partitions + 1)
+            )
+        self.column_types = dict(await fetch_table_columns(self.pool, config.table_name))
+        config.column_types = self.column_types
+        self.columns = project_columns(list(self.column_types))
+        logger.info(f"Fetching {len(self.columns)} columns: {', '.join(self.columns)}")
+        await fetch_sample_row_from_postgres(self.pool, config.table_name, self.columns)
+        if config.pagination == "keyset" and config.partitions == 1:
+            self.key_column, self.key_type = await resolve_key_column(
+                self.pool, config.table_name, config.id_column
+            )
+            if config.cursor_file:
+                self.cursor = KeysetCursor(config.cursor_file, config.table_name, self.key_column)
+                self.start_after = self.cursor.load()
+            if self.start_after is not None:
+                logger.info(f"Resuming after {self.key_column} = {self.start_after!r}")
+                self.resuming = True
+        if config.checkpoint:
+            await self.open_checkpoint()
+
+    async def open_checkpoint(self):
+        """Start a checkpoint journal, or pick up the ranges of the run it records."""
+        config = self.config
+        if config.partitions > 1:
+            self.key_column, self.key_type = await resolve_key_column(
+                self.pool, config.table_name, config.id_column
+            )
+            if self.key_type not in INTEGER_KEY_TYPES:
+                raise ValueError(
+                    f"--checkpoint with --partitions needs an integer key; "
+                    f"'{self.key_column}' is {self.key_type}"
+                )
+        journal = CheckpointJournal(
+            config.checkpoint, config.table_name, config.collection_name, self.key_column
+        )
+        if config.resume and journal.load():
+            self.resuming = True
+            if journal.completed:
+                logger.info(f"Checkpoint '{config.checkpoint}' records a completed run")
+            if config.partitions > 1:
+                self.key_ranges = []
+                for entry in journal.header["ranges"]:
+                    key_range = KeyRange(entry["partition"], entry["lower"], entry["upper"])
+                    if journal.frontier.get(key_range.partition) is not None:
+                        key_range.lower = journal.frontier[key_range.partition] + 1
+                    self.key_ranges.append(key_range)
+            else:
+                self.start_after = journal.frontier.get(0)
+            logger.info(
+                f"Resuming from checkpoint '{config.checkpoint}' after "
+                + ", ".join(
+                    f"{self.key_column} = {key!r} (partition {partition})"
+                    for partition, key in sorted(journal.frontier.items())
+                )
+            )
+        else:
+            if config.resume:
+                logger.warning(f"No checkpoint at '{config.checkpoint}'; starting a full run")
+            if config.partitions > 1:
+                async with self.pool.acquire() as conn:
+                    self.key_ranges = await plan_key_partitions(
+                        conn,
+                        validate_table_name(config.table_name),
+                        self.key_column,
+                        config.partitions,
+                    )
+        journal.start(
+            {
+                "table": config.table_name,
+                "collection": config.collection_name,
+                "key": self.key_column,
+                "ranges": [
+                    {"partition": r.partition, "lower": r.lower, "upper": r.upper}
+                    for r in self.key_ranges or []
+                ],
+            },
+            self.resuming,
+        )
+        self.journal = self.cursor = journal
+
+    async def checkpointed(self, chunks: AsyncIterator[RowChunk]) -> AsyncIterator[RowChunk]:
+        journal = self.journal
+        if journal.completed:
+            return
+        try:
+            async for chunk in chunks:
+                chunk.rows = journal.pending_rows(chunk)
+                yield chunk
+            journal.fetched_all = True
+        finally:
+            await chunks.aclose()
+
+    async def close(self):
+        if self.journal is not None:
+            self.journal.close()
+        if self.pool is not None and self.pool is not self.config.shared_pool:
+            await self.pool.close()
+
+    async def fields(self) -> List[Dict[str, Any]]:
+        config = self.config
+        return await load_schema_fields(
+            config,
+            [f"{name}:{self.column_types[name]}" for name in self.columns],
+            lambda: infer_schema_fields_from_postgres(
+                self.pool,
+                config.table_name,
+                self.column_types,
+                self.columns,
+                config.schema_sample_rows,
+            ),
+        )
+
+    def chunks(self) -> AsyncIterator[RowChunk]:
+        chunks = self.table_chunks()
+        return self.checkpointed(chunks) if self.journal else chunks
+
+    def table_chunks(self) -> AsyncIterator[RowChunk]:
+        config = self.config
+        if config.partitions > 1:
+            return iter_rows_from_postgres_partitioned(
+                self.pool,
+                config.table_name,
+                config.chunk_size,
+                config.partitions,
+                config.global_limit,
+                id_column=config.id_column,
+                order=config.partition_order,
+                partition_progress=config.partition_progress,
+                columns=self.columns,
+                key_ranges=self.key_ranges,
+            )
+        if config.pagination == "cursor":
+            return iter_rows_from_postgres_cursor(
+                self.pool,
+                config.table_name,
+                config.chunk_size,
+                config.global_limit,
+                columns=self.columns,
+            )
+        if config.pagination == "keyset":
+            return iter_rows_from_postgres_keyset(
+                self.pool,
+                config.table_name,
+                self.key_column,
+                self.key_type,
+                config.chunk_size,
+                config.global_limit,
+                start_after=self.start_after,
+                columns=self.columns,
+            )
+        return iter_rows_from_postgres(
+            self.pool,
+            config.table_name,
+            config.chunk_size,
+            config.global_limit,
+            columns=self.columns,
+        )
+
+
+class SupabaseSource(Source):
+    def __init__(self, config: SyncConfig):
+        super().__init__(config)
+        self.sample_rows: List[Dict[str, Any]] = []
+        self.columns: List[str] = []
+
+    async def open(self):
+        config = self.config
+        self.sample_rows = await fetch_sample_rows_from_supabase(
+            config, config.table_name, config.schema_sample_rows
+        )
+        self.columns = project_columns(list(self.sample_rows[0]))
+        logger.info(f"Fetching {len(self.columns)} columns: {', '.join(self.columns)}")
+
+    async def fields(self) -> List[Dict[str, Any]]:
+        async def infer_from_sample():
+            return infer_schema_fields_from_rows(self.sample_rows)
+
+        return await load_schema_fields(self.config, sorted(self.columns), infer_from_sample)
+
+    def chunks(self) -> AsyncIterator[RowChunk]:
+        config = self.config
+        if config.pagination == "keyset":
+            return iter_rows_from_supabase_keyset(
+                config,
+                config.table_name,
+                config.id_column or "id",
+                config.chunk_size,
+                config.global_limit,
+                columns=self.columns,
+            )
+        return iter_rows_from_supabase(
+            config,
+            config.table_name,
+            config.chunk_size,
+            config.global_limit,
+            columns=self.columns,
+            concurrency=config.supabase_concurrency,
+            order_column=config.id_column or ("id" if "id" in self.sample_rows[0] else None),
+        )
+
+
+class FileSource(Source):
+    """Rows from a local export; subclasses read one batch of up to `size` rows at a time.
+
+    Reads run in a worker thread so parsing never stalls the import workers.
+    """
+
+    def __init__(self, config: SyncConfig, path: str):
+        super().__init__(config)
+        self.path = path
+        self.handle: Any = None
+        self.sample_rows: List[Dict[str, Any]] = []
+
+    @abstractmethod
+    def open_file(self) -> Any:
+        ...
+
+    @abstractmethod
+    def read_rows(self, size: int) -> List[Dict[str, Any]]:
+        ...
+
+    async def open(self):
+        self.handle = await asyncio.to_thread(self.open_file)
+        self.sample_rows = await asyncio.to_thread(
+            self.read_rows, max(1, self.config.schema_sample_rows)
+        )
+        if not self.sample_rows:
+            raise ValueError(f"No data found in {self.path}.")
+
+    async def close(self):
+        if self.handle is not None:
+            await asyncio.to_thread(self.handle.close)
+
+    async def fields(self) -> List[Dict[str, Any]]:
+        written = self.written_schema()
+        if written is not None:
+            return written
+
+        async def infer_from_sample():
+            return infer_schema_fields_from_rows(self.sample_rows)
+
+        return await load_schema_fields(
+            self.config, sorted(self.sample_rows[0]), infer_from_sample
+        )
+
+    def written_schema(self) -> Optional[List[Dict[str, Any]]]:
+        """Fields of the <file>.schema.json a --sink-file run wrote next to the file.
+
+        Fields derived while encoding (row_id) are left out; they are derived
+        again for the new collection.
+        """
+        path = f"{self.path}.schema.json"
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        derived = derived_fields_for_schema(schema)
+        logger.info(f"Using the schema written with {self.path}")
+        return [
+            {"name": field["name"], "type": field["type"], "optional": field.get("optional", True)}
+            for field in schema["fields"]
+            if field["name"] not in derived
+        ]
+
+    async def chunks(self) -> AsyncIterator[RowChunk]:
+        config = self.config
+        logger.info(f"Reading rows from {self.path}")
+        pbar = tqdm(total=config.global_limit, desc="Fetching data")
+        # The sampled rows were already consumed from the file; emit them first.
+        pending = self.sample_rows
+        fetched = 0
+        try:
+            while True:
+                while len(pending) < config.chunk_size:
+                    more = await asyncio.to_thread(self.read_rows, config.chunk_size)
+                    if not more:
+                        break
+                    pending.extend(more)
+                if config.global_limit:
+                    pending = pending[: config.global_limit - fetched]
+                if not pending:
+                    break
+                rows, pending = pending[: config.chunk_size], pending[config.chunk_size :]
+                fetched += len(rows)
+                pbar.update(len(rows))
+                yield RowChunk(rows=rows)
+        finally:
+            pbar.close()
+
+
+class JsonlSource(FileSource):
+    def open_file(self):
+        return open(self.path, "r", encoding="utf-8")
+
+    def read_rows(self, size: int) -> List[Dict[str, Any]]:
+        rows = []
+        for line in self.handle:
+            if line.strip():
+                rows.append(json.loads(line))
+                if len(rows) >= size:
+                    break
+        return rows
+
+
+class CsvSource(FileSource):
+    """CSV with a header row; every value arrives as a string."""
+
+    def open_file(self):
+        f = open(self.path, "r", encoding="utf-8", newline="")
+        self.reader = csv.DictReader(f)
+        return f
+
+    def read_rows(self, size: int) -> List[Dict[str, Any]]:
+        return list(itertools.islice(self.reader, size))
+
+
+class ParquetSource(FileSource):
+    def open_file(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError(
+                "Parquet sources need pyarrow (pip install pyarrow)"
+            ) from exc
+        parquet = pq.ParquetFile(self.path)
+        self.batches = parquet.iter_batches(batch_size=self.config.chunk_size)
+        self.buffered: List[Dict[str, Any]] = []
+        return parquet
+
+    def read_rows(self, size: int) -> List[Dict[str, Any]]:
+        while len(self.buffered) < size:
+            batch = next(self.batches, None)
+            if batch is None:
+                break
+            self.buffered.extend(batch.to_pylist())
+        rows, self.buffered = self.buffered[:size], self.buffered[size:]
+        return rows
+
+
+FILE_SOURCES = {"jsonl": JsonlSource, "csv": CsvSource, "parquet": ParquetSource}
+
+
+def file_format_for_path(path: str) -> str:
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Cannot tell the format of '{path}'; pass --source-format")
+
+
+def create_source(config: SyncConfig) -> Source:
+    if config.source_file:
+        file_format = config.source_format
+        if file_format == "auto":
+            file_format = file_format_for_path(config.source_file)
+        return FILE_SOURCES[file_format](config, config.source_file)
+    if config.pg_uri:
+        return PostgresSource(config)
+    return SupabaseSource(config)
+
+
+def finalize_schema(schema: Dict[str, Any], id_column: Optional[str]) -> Dict[str, Any]:
+    fields = [field for field in schema["fields"] if field["name"] != "id"]
+    if not fields:
+        raise ValueError("Schema had no valid fields after removing 'id'.")
+
+    formatted_fields: List[Dict[str, Any]] = []
+    for field in fields:
+        field_name = field["name"]
+        field_type = field["type"]
+        formatted_field = {
+            "name": field_name,
+            "type": field_type,
+            "optional": field.get("optional", True),
+        }
+        if "id" in field_name.lower() and field_type in ["int64", "string"]:
+            formatted_field["facet"] = True
+        formatted_fields.append(formatted_field)
+
+    schema["fields"] = formatted_fields
+
+    default_sort = id_column or schema.get("default_sorting_field")
+    field_names = [field["name"] for field in formatted_fields]
+    if not default_sort or default_sort not in field_names:
+        default_sort = next(
+            (name for name in field_names if "id" in name.lower() and len(name) > 3),
+            field_names[0],
+        )
+    schema["default_sorting_field"] = default_sort
+
+    field_types = {field["name"]: field["type"] for field in formatted_fields}
+    default_type = field_types.get(default_sort)
+    if default_type not in ["int64", "float"]:
+        logger.info(
+            f"Default sorting field '{default_sort}' is not numeric. Adding row_id field."
+        )
+        # A source column called row_id (e.g. re-imported JSONL) is replaced, not duplicated.
+        schema["fields"] = [field for field in schema["fields"] if field["name"] != "row_id"]
+        schema["fields"].append({"name": "row_id", "type": "int64", "optional": False})
+        schema["default_sorting_field"] = "row_id"
+    else:
+        for field in schema["fields"]:
+            if field["name"] == schema["default_sorting_field"]:
+                field["optional"] = False
+                break
+
+    for field in schema["fields"]:
+        if isinstance(field["name"], str):
+            field["name"] = field["name"].replace("'", '"')
+        if isinstance(field["type"], str):
+            field["type"] = field["type"].replace("'", '"')
+
+    required_keys = ["name", "fields", "default_sorting_field"]
+    for key in required_keys:
+        if key not in schema:
+            raise ValueError(f"Missing required key in schema: {key}")
+
+    return schema
+
+
+def row_position(position: int, row: Any) -> int:
+    return position
+
+
+def derived_fields_for_schema(schema: Dict[str, Any]) -> Dict[str, Callable[[int, Any], Any]]:
+    """Fields the schema needs that no source column holds, computed per row while encoding."""
+    derived: Dict[str, Callable[[int, Any], Any]] = {}
+    if schema["default_sorting_field"] == "row_id":
+        derived["row_id"] = row_position
+    return derived
+
+
+async def maybe_drop_typesense_collection(config: SyncConfig):
+    if not config.drop_collection:
+        return
+    index = get_digest_index(config)
+    if index is not None:
+        index.clear(config.collection_name)
+    url = f"{config.typesense_host.rstrip('/')}/collections/{config.collection_name}"
+    logger.info(
+        f"Attempting to drop Typesense collection '{config.collection_name}'..."
+    )
+    client = get_http_client(config)
+    try:
+        response = await client.delete(
+            url,
+            headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+            timeout=10.0,
+        )
+        if response.status_code in [200, 204]:
+            logger.info(
+                f"Collection '{config.collection_name}' dropped successfully."
+            )
+        elif response.status_code == 404:
+            logger.info(
+                f"Collection '{config.collection_name}' does not exist (404)."
+            )
+        else:
+            logger.error(
+                f"Failed to drop collection: {response.status_code} - {response.text}"
+            )
+    except Exception as e:
+        logger.error(f"Error while dropping collection: {e}")
+
+
+async def create_typesense_collection(
+    schema: Dict[str, Any], config: SyncConfig, recreate: bool = True
+):
+    host = config.typesense_host.rstrip("/")
+    client = get_http_client(config)
+    delete_url = f"{host}/collections/{schema['name']}"
+    try:
+        if recreate:
+            del_resp = await client.delete(
+                delete_url,
+                headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+                timeout=10.0,
+            )
+            if del_resp.status_code in [200, 204]:
+                logger.info(f"Deleted existing collection '{schema['name']}'")
+            else:
+                logger.debug(
+                    f"No existing collection to delete or delete failed: {del_resp.status_code} - {del_resp.text}"
+                )
+    except Exception as e:
+        logger.warning(f"Exception during collection delete: {e}")
+
+    try:
+        logger.info(f"Creating collection with {len(schema['fields'])} fields")
+        if not schema.get("name") or not schema.get("fields"):
+            raise ValueError("Invalid schema: 'name' and 'fields' are required.")
+        schema_json = json.dumps(schema)
+        response = await client.post(
+            f"{host}/collections",
+            headers={
+                "X-TYPESENSE-API-KEY": config.typesense_api_key,
+                "Content-Type": "application/json",
+            },
+            content=schema_json,
+            timeout=10.0,
+        )
+        if response.status_code in [200, 201]:
+            logger.info("Collection created successfully.")
+        elif response.status_code == 409:
+            logger.info(f"Collection already exists (409): {response.text}")
+        else:
+            logger.error(
+                f"Failed to create collection: {response.status_code} - {response.text}"
+            )
+            raise Exception("Collection creation failed")
+    except httpx.HTTPStatusError as he:
+        logger.error(
+            f"HTTP error while creating collection: {he.response.status_code} - {he.response.text}"
+        )
+        raise
+    except httpx.RequestError as re:
+        logger.error(f"Connection error while creating collection: {re}")
+        raise
+
+
+def generation_name(alias: str) -> str:
+    return f"{alias}_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}"
+
+
+async def get_alias_target(config: SyncConfig, alias: str) -> Optional[str]:
+    response = await get_http_client(config).get(
+        f"{config.typesense_host.rstrip('/')}/aliases/{alias}",
+        headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+        timeout=10.0,
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()["collection_name"]
+
+
+async def fetch_collection(config: SyncConfig, name: str) -> Optional[Dict[str, Any]]:
+    response = await get_http_client(config).get(
+        f"{config.typesense_host.rstrip('/')}/collections/{name}",
+        headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+        timeout=10.0,
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_max_row_id(config: SyncConfig, name: str) -> int:
+    """Highest row_id in a collection, or its document count when it cannot be searched."""
+    response = await get_http_client(config).get(
+        f"{config.typesense_host.rstrip('/')}/collections/{name}/documents/search",
+        headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
+        params={"q": "*", "sort_by": "row_id:desc", "per_page": 1, "include_fields": "row_id"},
+        timeout=10.0,
+    )
+    if response.status_code == 200:
+        hits = response.json().get("hits") or []
+        return int(hits[0]["document"]["row_id"]) if hits else 0
+    logger.warning(
+        f"Could not look up the highest row_id in '{name}' ({response.status_code}); "
+        "numbering new upserts after the document count"
+    )
+    collection = await fetch_collection(config, name)
+    return collection.get("num_documents", 0) if collection else 0
+
+
+async def check_alias_available(config: SyncConfig, alias: str):
+    """A real collection named like the alias would shadow it; refuse before loading."""
+    if await get_alias_target(config, alias) is None and await fetch_collection(config, alias):
+        raise ValueError(
+            f"A collection named '{alias}' exists, so it cannot be used as an alias. "
+            "Drop or rename it once, or pick another collection_name."
+        )
+
+
+async def drop_old_generations(config: SyncConfig, alias: str, live: str):
+    host = config.typesense_host.rstrip("/")
+    headers = {"X-TYPESENSE-API-KEY": config.typesense_api_key}
+    client = get_http_client(config)
+    response = await client.get(f"{host}/collections", headers=headers, timeout=10.0)
+    response.raise_for_status()
+    pattern = re.compile(rf"^{re.escape(alias)}_\d{{8}}T\d{{6}}$")
+    generations = sorted(
+        (c["name"] for c in response.json() if pattern.match(c["name"])), reverse=True
+    )
+    for name in generations[config.keep_generations :]:
+        if name == live:
+            continue
+        response = await client.delete(f"{host}/collections/{name}", headers=headers, timeout=30.0)
+        if response.status_code in [200, 204]:
+            logger.info(f"Dropped old generation '{name}'")
+        else:
+            logger.warning(f"Could not drop '{name}': {response.status_code} - {response.text}")
+
+
+async def publish_generation(
+    config: SyncConfig, alias: str, collection_name: str, expected: int
+):
+    """Point `alias` at a freshly loaded collection once it holds all `expected` rows.
+
+    The previous target keeps serving until the alias update, which Typesense
+    applies atomically. Unverified generations are left in place for inspection.
+    """
+    if config.metrics.counters["failed_batches"]:
+        raise RuntimeError(
+            f"{config.metrics.counters['failed_batches']} batches failed; '{alias}' still points at the "
+            f"previous collection and '{collection_name}' was left for inspection."
+        )
+    collection = await fetch_collection(config, collection_name)
+    found = collection.get("num_documents") if collection else None
+    if not expected or found != expected:
+        raise RuntimeError(
+            f"'{collection_name}' holds {found} documents but {expected} rows were read; "
+            f"not repointing '{alias}'."
+        )
+
+    previous = await get_alias_target(config, alias)
+    response = await get_http_client(config).put(
+        f"{config.typesense_host.rstrip('/')}/aliases/{alias}",
+        headers={
+            "X-TYPESENSE-API-KEY": config.typesense_api_key,
+            "Content-Type": "application/json",
+        },
+        content=json.dumps({"collection_name": collection_name}),
+        timeout=10.0,
+    )
+    response.raise_for_status()
+    logger.info(f"Alias '{alias}' now points at '{collection_name}' (was {previous})")
+    await drop_old_generations(config, alias, collection_name)
+
+
+class CallbackDispatcher:
+    """Deliver --callback-url notifications off the import path.
+
+    Import workers only call `notify()`, which adds the batch to a running
+    total per collection and never waits. Every `interval` seconds the totals
+    become one notification on a bounded queue, which a single sender task
+    POSTs with exponential backoff. When the queue is full, or a notification
+    runs out of retries, it is dropped or appended to the spill file.
+    """
+
+    def __init__(self, config: SyncConfig):
+        self.config = config
+        self.url = config.callback_url.strip()
+        self.headers = {"Content-Type": "application/json"}
+        if config.callback_headers:
+            self.headers.update(config.callback_headers)
+        self.totals: Dict[str, Dict[str, int]] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.callback_queue_size)
+        self.sending: Optional[Dict[str, Any]] = None
+        self.closing = asyncio.Event()
+        config.metrics.gauges["callback_queue"] = self.queue.qsize
+        self.flusher = asyncio.create_task(self._flush_periodically())
+        self.sender = asyncio.create_task(self._send_forever())
+
+    def notify(self, collection_name: str, batch_start: int, batch_size: int, added: int):
+        totals = self.totals.get(collection_name)
+        if totals is None:
+            self.totals[collection_name] = {
+                "batch_start": batch_start,
+                "batch_size": batch_size,
+                "added": added,
+                "batches": 1,
+            }
+            return
+        totals["batch_start"] = min(totals["batch_start"], batch_start)
+        totals["batch_size"] += batch_size
+        totals["added"] += added
+        totals["batches"] += 1
+
+    def flush(self):
+        totals, self.totals = self.totals, {}
+        for collection_name, counts in totals.items():
+            payload = {"collection": collection_name, **counts}
+            try:
+                self.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.overflow(payload, "callback queue is full")
+
+    def overflow(self, payload: Dict[str, Any], reason: str):
+        self.config.metrics.inc("callbacks_dropped")
+        if self.config.callback_overflow != "spill":
+            logger.warning(f"Dropping callback for {payload['collection']}: {reason}")
+            return
+        try:
+            with open(self.config.callback_spill, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"reason": reason, "payload": payload}) + "\n")
+        except Exception as exc:
+            logger.error(f"Could not spill callback: {exc}")
+
+    async def _flush_periodically(self):
+        while not self.closing.is_set():
+            try:
+                await asyncio.wait_for(self.closing.wait(), self.config.callback_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush()
+
+    async def _send_forever(self):
+        while True:
+            payload = await self.queue.get()
+            self.sending = payload
+            try:
+                await self.deliver(payload)
+                self.sending = None
+            finally:
+                self.queue.task_done()
+
+    async def deliver(self, payload: Dict[str, Any]):
+        config = self.config
+        reason = ""
+        for attempt in range(1, config.callback_retries + 1):
+            try:
+                response = await get_http_client(config).post(
+                    self.url, json=payload, headers=self.headers, timeout=30
+                )
+                if response.status_code in (200, 201, 202, 204):
+                    config.metrics.inc("callbacks_sent")
+                    return
+                reason = f"returned {response.status_code}"
+            except Exception as exc:
+                reason = f"failed: {exc}"
+            config.metrics.inc("callbacks_failed")
+            logger.warning(
+                f"Callback to {self.url} {reason} (attempt {attempt}/{config.callback_retries})"
+            )
+            if attempt < config.callback_retries:
+                await asyncio.sleep(min(60.0, 0.5 * 2 ** attempt))
+        self.overflow(payload, reason)
+
+    async def close(self, timeout: float = 30.0):
+        """Send what is left, giving up on whatever is still queued after `timeout`.
+
+        A notification cancelled mid-delivery is dropped or spilled like the
+        queued ones, so it may reach the callback twice but is never lost.
+        """
+        self.closing.set()
+        await self.flusher
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pending = self.queue.qsize() + (self.sending is not None)
+            logger.warning(f"{pending} callback notifications not delivered")
+        self.sender.cancel()
+        await asyncio.gather(self.sender, return_exceptions=True)
+        if self.sending is not None:
+            self.overflow(self.sending, "not delivered before exit")
+            self.sending = None
+        while not self.queue.empty():
+            self.overflow(self.queue.get_nowait(), "not delivered before exit")
+
+
+def notify_callback(
+    config: SyncConfig,
+    collection_name: str,
+    batch_start: int,
+    batch_size: int,
+    added: int,
+):
+    if not config.callback_url or not added or not config.callback_url.strip():
+        return
+    if config.callback_dispatcher is None:
+        config.callback_dispatcher = CallbackDispatcher(config)
+    config.callback_dispatcher.notify(collection_name, batch_start, batch_size, added)
+
+
+async def close_callback_dispatcher(config: SyncConfig):
+    if config.callback_dispatcher is not None:
+        await config.callback_dispatcher.close()
+        config.callback_dispatcher = None
+
+
+def record_failed_batch(
+    config: SyncConfig,
+    collection_name: str,
+    batch_start: int,
+    batch_size: int,
+    reason: str,
+):
+    if not config.failed_batch_log:
+        return
+    entry = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "collection": collection_name,
+        "batch_start": batch_start,
+        "batch_size": batch_size,
+        "reason": reason,
+    }
+    try:
+        with open(config.failed_batch_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except Exception as exc:
+        logger.warning(f"Could not write failed batch log: {exc}")
+
+
+class FailedDocumentSpool:
+    """SQLite spool of encoded documents Typesense did not accept, with the error.
+
+    Whole failed batches and documents rejected individually in an import
+    response both land here, so `--replay-failed` can retry exactly those
+    documents later instead of re-syncing the table.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS failed_documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT NOT NULL,
+                document BLOB NOT NULL,
+                error TEXT,
+                failed_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS failed_documents_collection"
+            " ON failed_documents (collection, id)"
+        )
+        self.conn.commit()
+
+    def add(self, collection_name: str, documents: List[Tuple[bytes, str]]):
+        failed_at = datetime.utcnow().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO failed_documents (collection, document, error, failed_at)"
+                " VALUES (?, ?, ?, ?)",
+                [(collection_name, doc, error, failed_at) for doc, error in documents],
+            )
+
+    def count(self, collection_name: str) -> int:
+        return self.conn.execute(
+            "SELECT count(*) FROM failed_documents WHERE collection = ?", (collection_name,)
+        ).fetchone()[0]
+
+    def iter_batches(self, collection_name: str, batch_size: int):
+        """Yield lists of (spool id, document) spooled before this call."""
+        (max_id,) = self.conn.execute(
+            "SELECT coalesce(max(id), 0) FROM failed_documents WHERE collection = ?",
+            (collection_name,),
+        ).fetchone()
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, document FROM failed_documents"
+                " WHERE collection = ? AND id > ? AND id <= ? ORDER BY id LIMIT ?",
+                (collection_name, last_id, max_id, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def remove(self, ids: List[int]):
+        with self.conn:
+            self.conn.executemany("DELETE FROM failed_documents WHERE id = ?", [(i,) for i in ids])
+
+    def close(self):
+        self.conn.close()
+
+
+class DigestIndex:
+    """SQLite map of (collection, document id) -> hash of the JSONL line Typesense
+    last accepted for it.
+
+    An entry is written only after Typesense reports that document as a
+    success and is removed when an import of it fails or it is deleted. A
+    matching hash therefore means Typesense already holds exactly that
+    document, and the import can be skipped.
+    """
+
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS document_digests (
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                digest BLOB NOT NULL,
+                PRIMARY KEY (collection, doc_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def digest(line: bytes, derived: Iterable[str] = ()) -> bytes:
+        """Hash a document without its `derived` fields.
+
+        row_id follows the row's position in the stream, so an insert before
+        a row changes it without the row changing; hashing it would make
+        every later document look new.
+        """
+        if derived:
+            doc = json.loads(line)
+            for name in derived:
+                doc.pop(name, None)
+            line = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return hashlib.blake2b(line, digest_size=16).digest()
+
+    def lookup(self, collection_name: str, ids: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        for i in range(0, len(ids), self.LOOKUP_CHUNK):
+            part = ids[i : i + self.LOOKUP_CHUNK]
+            found.update(
+                self.conn.execute(
+                    "SELECT doc_id, digest FROM document_digests WHERE collection = ?"
+                    f" AND doc_id IN ({', '.join('?' * len(part))})",
+                    (collection_name, *part),
+                ).fetchall()
+            )
+        return found
+
+    def update(self, collection_name: str, entries: List[Tuple[str, bytes]]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO document_digests (collection, doc_id, digest)"
+                " VALUES (?, ?, ?)",
+                [(collection_name, doc_id, digest) for doc_id, digest in entries],
+            )
+
+    def forget(self, collection_name: str, ids: List[str]):
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM document_digests WHERE collection = ? AND doc_id = ?",
+                [(collection_name, doc_id) for doc_id in ids],
+            )
+
+    def clear(self, collection_name: str):
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM document_digests WHERE collection = ?", (collection_name,)
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def get_digest_index(config: SyncConfig) -> Optional[DigestIndex]:
+    if config.digest_index is None and config.digest_cache:
+        config.digest_index = DigestIndex(config.digest_cache)
+    return config.digest_index
+
+
+def record_import_digests(
+    config: SyncConfig,
+    collection_name: str,
+    ids: Optional[List[Optional[str]]],
+    lines: List[bytes],
+    accepted: List[bool],
+):
+    """Remember the documents Typesense accepted and forget the ones it did not."""
+    index = get_digest_index(config)
+    if index is None or ids is None:
+        return
+    derived = get_document_encoder(config).derived_fields
+    done = [
+        (doc_id, index.digest(line, derived))
+        for doc_id, line, ok in zip(ids, lines, accepted)
+        if ok and doc_id is not None
+    ]
+    failed = [doc_id for doc_id, ok in zip(ids, accepted) if not ok and doc_id is not None]
+    try:
+        if done:
+            index.update(collection_name, done)
+        if failed:
+            index.forget(collection_name, failed)
+    except sqlite3.Error as exc:
+        logger.warning(f"Could not update digest cache: {exc}")
+
+
+def document_ids(config: SyncConfig, rows: List[Any]) -> Optional[List[Optional[str]]]:
+    """Document id of every row, as the encoder writes it; None without a digest cache."""
+    column = config.document_id_column
+    if not config.digest_cache or not column:
+        return None
+    ids = []
+    for row in rows:
+        value = row.get(column)
+        ids.append(None if value is None else str(coerce_value(value)))
+    return ids
+
+
+def get_failed_spool(config: SyncConfig) -> Optional[FailedDocumentSpool]:
+    if config.failed_spool is None and config.spool_path:
+        try:
+            config.failed_spool = FailedDocumentSpool(config.spool_path)
+        except sqlite3.Error as exc:
+            logger.warning(f"Could not open failed document spool {config.spool_path}: {exc}")
+            config.spool_path = None
+    return config.failed_spool
+
+
+def spool_failed_documents(
+    config: SyncConfig, collection_name: str, documents: List[Tuple[bytes, str]]
+):
+    if not documents:
+        return
+    spool = get_failed_spool(config)
+    if spool is None:
+        return
+    try:
+        spool.add(collection_name, documents)
+    except sqlite3.Error as exc:
+        logger.warning(f"Could not spool {len(documents)} failed documents: {exc}")
+
+
+class ImportControl:
+    """Shared limits for import requests: concurrency and batch payload bytes.
+
+    A 413 always lowers the byte budget below the rejected size, without a
+    floor, so a small server limit ends in one document per request. In adaptive
+    mode both limits also follow AIMD: each fast import adds one request slot
+    and 1/16 of the byte ceiling, while a 429/503 or an import slower than
+    `target_latency` halves both (at most once per `target_latency` window, so
+    one burst of errors does not collapse the limits to their floor).
+    """
+
+    MIN_BATCH_BYTES = 16 * 1024
+
+    def __init__(
+        self, max_concurrency: int, max_batch_bytes: int, adaptive: bool, target_latency: float
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_batch_bytes = max_batch_bytes
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.concurrency = self.max_concurrency
+        self.batch_bytes = max_batch_bytes
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.changed:
+            self.in_flight -= 1
+            self.changed.notify_all()
+
+    async def on_success(self, latency: float):
+        if not self.adaptive:
+            return
+        if latency > self.target_latency:
+            await self.back_off(f"import took {latency:.2f}s")
+            return
+        async with self.changed:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.batch_bytes = min(
+                self.max_batch_bytes, self.batch_bytes + max(1, self.max_batch_bytes // 16)
+            )
+            self.changed.notify_all()
+
+    async def back_off(self, reason: str):
+        if not self.adaptive:
+            return
+        now = asyncio.get_running_loop().time()
+        if now - self.last_decrease < self.target_latency:
+            return
+        self.last_decrease = now
+        self.concurrency = max(1, self.concurrency // 2)
+        self.batch_bytes = max(
+            min(self.MIN_BATCH_BYTES, self.max_batch_bytes), self.batch_bytes // 2
+        )
+        logger.warning(
+            f"Backing off ({reason}): concurrency {self.concurrency}, "
+            f"batch budget {self.batch_bytes} bytes"
+        )
+
+    def on_too_large(self, nbytes: int, num_docs: int):
+        self.max_batch_bytes = max(1, min(self.max_batch_bytes, nbytes - 1))
+        if num_docs > 1:
+            self.batch_bytes = max(1, min(self.batch_bytes, nbytes // 2))
+        else:
+            # One oversized document says nothing about the size of smaller batches.
+            self.batch_bytes = min(self.batch_bytes, self.max_batch_bytes)
+        logger.warning(f"Batch budget lowered to {self.batch_bytes} bytes after a 413")
+
+
+class ImportScheduler:
+    """Share one import budget fairly between the jobs of a --jobs-file run.
+
+    Every import request asks for its payload size in bytes, plus one token
+    when a requests/sec rate is set. Requests wait in one queue per job, and
+    grants rotate round-robin across jobs, so a job with more workers or
+    bigger batches cannot crowd the others out.
+    """
+
+    def __init__(self, max_inflight_bytes: int, requests_per_second: float = 0):
+        self.max_inflight_bytes = max_inflight_bytes
+        self.rate = requests_per_second
+        self.tokens = max(1.0, requests_per_second)
+        self.inflight = 0
+        self.waiters: Dict[str, Deque[Tuple[int, asyncio.Future]]] = {}
+        self.turns: Deque[str] = deque()
+        self.updated = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self, job: str, nbytes: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self.waiters.setdefault(job, deque())
+        if not queue:
+            self.turns.append(job)
+        queue.append((nbytes, future))
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(nbytes)
+            raise
+
+    def release(self, nbytes: int):
+        self.inflight -= nbytes
+        self.dispatch()
+
+    def refill(self):
+        now = asyncio.get_running_loop().time()
+        if self.rate:
+            elapsed = now - self.updated if self.updated else 0.0
+            self.tokens = min(max(1.0, self.rate), self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def on_timer(self):
+        self.timer = None
+        self.dispatch()
+
+    def dispatch(self):
+        self.refill()
+        while self.turns:
+            job = self.turns[0]
+            queue = self.waiters[job]
+            while queue and queue[0][1].cancelled():
+                queue.popleft()
+            if not queue:
+                self.turns.popleft()
+                continue
+            nbytes, future = queue[0]
+            # A single oversized request may still run alone.
+            if self.inflight and self.inflight + nbytes > self.max_inflight_bytes:
+                return
+            if self.rate and self.tokens < 1:
+                if self.timer is None:
+                    self.timer = asyncio.get_running_loop().call_later(
+                        (1 - self.tokens) / self.rate, self.on_timer
+                    )
+                return
+            queue.popleft()
+            self.turns.rotate(-1)
+            if not queue:
+                self.turns.pop()
+            if self.rate:
+                self.tokens -= 1
+            self.inflight += nbytes
+            future.set_result(None)
+
+
+def get_import_control(config: SyncConfig) -> ImportControl:
+    if config.import_control is None:
+        config.import_control = ImportControl(
+            config.num_workers, config.max_batch_bytes, config.adaptive, config.target_latency
+        )
+    return config.import_control
+
+
+def split_lines_by_bytes(
+    lines: List[bytes], max_bytes: int, max_rows: int
+) -> List[Tuple[int, List[bytes]]]:
+    """Cut encoded lines into (offset, lines) batches of at most `max_rows`
+    lines and `max_bytes` bytes. A line larger than `max_bytes` gets a batch
+    of its own."""
+    batches = []
+    start = 0
+    size = 0
+    for i, line in enumerate(lines):
+        if i > start and (i - start >= max_rows or size + len(line) + 1 > max_bytes):
+            batches.append((start, lines[start:i]))
+            start = i
+            size = 0
+        size += len(line) + 1
+    if start < len(lines):
+        batches.append((start, lines[start:]))
+    return batches
+
+
+async def import_batch(
+    batch: List[Dict[str, Any]],
+    batch_index: int,
+    collection_name: str,
+    config: SyncConfig,
+) -> bool:
+    """Transform one batch into JSONL and upsert it, retrying transient failures.
+
+    Returns True when Typesense accepted the batch.
+    """
+    lines = get_document_encoder(config).encode_lines(batch, batch_index + 1)
+    return await import_lines(
+        lines, batch_index, collection_name, config, ids=document_ids(config, batch)
+    )
+
+
+async def import_lines(
+    lines: List[bytes],
+    batch_index: int,
+    collection_name: str,
+    config: SyncConfig,
+    ids: Optional[List[Optional[str]]] = None,
+) -> bool:
+    """Upsert already encoded JSONL lines, retrying transient failures.
+
+    A 413 splits the batch in half and imports both halves, down to single
+    documents. Returns True when Typesense accepted every part. `ids`, the
+    document id of each line, lets the digest cache record the outcome.
+    """
+    host = config.typesense_host.rstrip("/")
+    logger.info(f"Worker starting batch {batch_index}, size {len(lines)}")
+
+    # Prepare JSONL payload
+    jsonl_data = b"\n".join(lines)
+
+    metrics = config.metrics
+    metrics.inc("total_batches")
+
+    # Post to Typesense
+    max_retries = 3
+    attempt = 0
+    batch_success_count = 0
+    reason = ""
+    accepted = False
+    too_large = False
+
+    client = get_http_client(config)
+    control = get_import_control(config)
+    loop = asyncio.get_running_loop()
+    while attempt < max_retries:
+        try:
+            url = f"{host}/collections/{collection_name}/documents/import?action=upsert"
+            logger.debug(f"POST {url}, batch {batch_index}, {len(jsonl_data)} bytes")
+
+            scheduler = config.import_scheduler
+            waiting = loop.time()
+            await control.acquire()
+            try:
+                if scheduler:
+                    await scheduler.acquire(collection_name, len(jsonl_data))
+                metrics.observe("import_wait_seconds", loop.time() - waiting)
+                metrics.inc("import_requests")
+                metrics.inc("import_bytes", len(jsonl_data))
+                try:
+                    started = loop.time()
+                    response = await client.post(
+                        url,
+                        headers={
+                            "X-TYPESENSE-API-KEY": config.typesense_api_key,
+                            "Content-Type": "application/json",
+                        },
+                        content=jsonl_data,
+                    )
+                    latency = loop.time() - started
+                    metrics.observe("import_seconds", latency)
+                finally:
+                    if scheduler:
+                        scheduler.release(len(jsonl_data))
+            finally:
+                await control.release()
+            logger.debug(f"Batch {batch_index} response: {response.status_code}")
+
+            if response.status_code == 413:
+                control.on_too_large(len(jsonl_data), len(lines))
+                metrics.inc("import_too_large")
+                too_large = len(lines) > 1
+                if too_large:
+                    reason = "request too large"
+                    logger.warning(f"Batch {batch_index} too large ({len(jsonl_data)} bytes)")
+                else:
+                    # Spooled below rather than retried: it can never fit this server.
+                    reason = f"document of {len(jsonl_data)} bytes exceeds the server's request limit"
+                    logger.error(f"Doc {batch_index} failed: {reason}")
+                break
+
+            if response.status_code != 200:
+                reason = response.text
+                attempt += 1
+                logger.warning(f"Batch {batch_index} failed: {reason}")
+                if response.status_code in (429, 503):
+                    await control.back_off(f"HTTP {response.status_code}")
+                if attempt < max_retries:
+                    metrics.inc("import_retries")
+                    await asyncio.sleep(2 * attempt)
+                    continue
+                break
+
+            await control.on_success(latency)
+
+            # Parse success count
+            rejected = []
+            succeeded = [False] * len(lines)
+            response_lines = response.text.strip().split("\n")
+            for j, line in enumerate(response_lines):
+                try:
+                    result = json.loads(line)
+                    if result.get("success", False):
+                        batch_success_count += 1
+                        if j < len(lines):
+                            succeeded[j] = True
+                    else:
+                        logger.warning(f"Doc {batch_index+j} failed: {line}")
+                        if j < len(lines):
+                            rejected.append((lines[j], result.get("error") or line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Could not parse: {line}")
+            spool_failed_documents(config, collection_name, rejected)
+            record_import_digests(config, collection_name, ids, lines, succeeded)
+            metrics.inc("successful_docs", batch_success_count)
+            metrics.inc("failed_docs", len(rejected))
+
+            logger.info(f"Batch {batch_index} indexed {batch_success_count}/{len(lines)} docs")
+            accepted = True
+
+            notify_callback(
+                config, collection_name, batch_index, len(lines), batch_success_count
+            )
+            break
 
-    schema["fields"] = formatted_fields
+        except (httpx.RequestError, httpx.TimeoutException, httpx.ConnectError) as e:
+            attempt += 1
+            reason = str(e)
+            logger.error(f"Batch {batch_index} network error (attempt {attempt}/{max_retries}): {e}")
+            if isinstance(e, httpx.TimeoutException):
+                await control.back_off("timeout")
+            if attempt < max_retries:
+                metrics.inc("import_retries")
+                await asyncio.sleep(2 * attempt)
+                continue
+            logger.error(f"Batch {batch_index} failed after {max_retries} attempts")
+            break
+        except Exception as e:
+            reason = str(e)
+            logger.error(f"Batch {batch_index} error: {e}")
+            break
 
-    default_sort = id_column or schema.get("default_sorting_field")
-    field_names = [field["name"] for field in formatted_fields]
-    if not default_sort or default_sort not in field_names:
-        default_sort = next(
-            (name for name in field_names if "id" in name.lower() and len(name) > 3),
-            field_names[0],
+    if too_large:
+        mid = len(lines) // 2
+        logger.info(f"Splitting batch {batch_index} into {mid} + {len(lines) - mid} docs")
+        first = await import_lines(
+            lines[:mid], batch_index, collection_name, config, ids and ids[:mid]
         )
-    schema["default_sorting_field"] = default_sort
+        second = await import_lines(
+            lines[mid:], batch_index + mid, collection_name, config, ids and ids[mid:]
+        )
+        return first and second
 
-    field_types = {field["name"]: field["type"] for field in formatted_fields}
-    default_type = field_types.get(default_sort)
-    if default_type not in ["int64", "float"]:
-        logger.info(
-            f"Default sorting field '{default_sort}' is not numeric. Adding row_id field."
+    if not accepted:
+        metrics.inc("failed_batches")
+        record_failed_batch(
+            config, collection_name, batch_index, len(lines), reason or "unknown failure"
         )
-        schema["fields"].append({"name": "row_id", "type": "int64", "optional": False})
-        schema["default_sorting_field"] = "row_id"
-        for idx, record in enumerate(data, start=1):
-            record["row_id"] = idx
-    else:
-        for field in schema["fields"]:
-            if field["name"] == schema["default_sorting_field"]:
-                field["optional"] = False
-                break
+        spool_failed_documents(
+            config, collection_name, [(line, reason or "unknown failure") for line in lines]
+        )
+        record_import_digests(config, collection_name, ids, lines, [False] * len(lines))
+    return accepted
 
-    for field in schema["fields"]:
-        if isinstance(field["name"], str):
-            field["name"] = field["name"].replace("'", '"')
-        if isinstance(field["type"], str):
-            field["type"] = field["type"].replace("'", '"')
 
-    required_keys = ["name", "fields", "default_sorting_field"]
-    for key in required_keys:
-        if key not in schema:
-            raise ValueError(f"Missing required key in schema: {key}")
+class Sink(ABC):
+    """Where encoded documents go: prepared once with the final schema, then
+    fed batches of JSONL lines by the import workers (concurrently)."""
 
-    return schema
+    async def prepare(self, schema: Dict[str, Any], recreate: bool = True):
+        pass
 
+    @abstractmethod
+    async def write(
+        self, lines: List[bytes], batch_index: int, ids: Optional[List[Optional[str]]] = None
+    ) -> bool:
+        ...
 
-async def maybe_drop_typesense_collection(config: SyncConfig):
-    if not config.drop_collection:
-        return
-    url = f"{config.typesense_host.rstrip('/')}/collections/{config.collection_name}"
-    logger.info(
-        f"Attempting to drop Typesense collection '{config.collection_name}'..."
-    )
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.delete(
-                url,
-                headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
-            )
-            if response.status_code in [200, 204]:
-                logger.info(
-                    f"Collection '{config.collection_name}' dropped successfully."
-                )
-            elif response.status_code == 404:
-                logger.info(
-                    f"Collection '{config.collection_name}' does not exist (404)."
-                )
-            else:
-                logger.error(
-                    f"Failed to drop collection: {response.status_code} - {response.text}"
-                )
-        except Exception as e:
-            logger.error(f"Error while dropping collection: {e}")
+    @abstractmethod
+    async def delete(self, ids: List[str]) -> int:
+        ...
 
+    async def close(self):
+        pass
 
-async def create_typesense_collection(schema: Dict[str, Any], config: SyncConfig):
-    host = config.typesense_host.rstrip("/")
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        delete_url = f"{host}/collections/{schema['name']}"
-        try:
-            del_resp = await client.delete(
-                delete_url,
-                headers={"X-TYPESENSE-API-KEY": config.typesense_api_key},
-            )
-            if del_resp.status_code in [200, 204]:
-                logger.info(f"Deleted existing collection '{schema['name']}'")
-            else:
-                logger.debug(
-                    f"No existing collection to delete or delete failed: {del_resp.status_code} - {del_resp.text}"
-                )
-        except Exception as e:
-            logger.warning(f"Exception during collection delete: {e}")
 
-        try:
-            logger.info(f"Creating collection with {len(schema['fields'])} fields")
-            if not schema.get("name") or not schema.get("fields"):
-                raise ValueError("Invalid schema: 'name' and 'fields' are required.")
-            schema_json = json.dumps(schema)
-            response = await client.post(
-                f"{host}/collections",
-                headers={
-                    "X-TYPESENSE-API-KEY": config.typesense_api_key,
-                    "Content-Type": "application/json",
-                },
-                data=schema_json,
-            )
-            if response.status_code in [200, 201]:
-                logger.info("Collection created successfully.")
-            elif response.status_code == 409:
-                logger.info(f"Collection already exists (409): {response.text}")
-            else:
-                logger.error(
-                    f"Failed to create collection: {response.status_code} - {response.text}"
-                )
-                raise Exception("Collection creation failed")
-        except httpx.HTTPStatusError as he:
-            logger.error(
-                f"HTTP error while creating collection: {he.response.status_code} - {he.response.text}"
-            )
-            raise
-        except httpx.RequestError as re:
-            logger.error(f"Connection error while creating collection: {re}")
-            raise
+class TypesenseSink(Sink):
+    def __init__(self, config: SyncConfig, collection_name: str):
+        self.config = config
+        self.collection_name = collection_name
 
+    async def prepare(self, schema: Dict[str, Any], recreate: bool = True):
+        await create_typesense_collection(schema, self.config, recreate=recreate)
 
-async def maybe_notify_callback(
-    config: SyncConfig,
-    collection_name: str,
-    batch_start: int,
-    batch_size: int,
-    added: int,
+    async def write(
+        self, lines: List[bytes], batch_index: int, ids: Optional[List[Optional[str]]] = None
+    ) -> bool:
+        return await import_lines(lines, batch_index, self.collection_name, self.config, ids)
+
+    async def delete(self, ids: List[str]) -> int:
+        return await delete_typesense_documents(ids, self.collection_name, self.config)
+
+
+class JsonlFileSink(Sink):
+    """Write Typesense-ready JSONL to a file, plus the collection schema next to it.
+
+    The output can be bulk-imported later (e.g. with --source-file) or used
+    to time the fetch and encode stages without a search server.
+    """
+
+    def __init__(self, config: SyncConfig, path: str):
+        self.config = config
+        self.path = path
+        self.file: Any = None
+        self.lock = asyncio.Lock()
+
+    async def prepare(self, schema: Dict[str, Any], recreate: bool = True):
+        with open(f"{self.path}.schema.json", "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=2)
+        self.file = open(self.path, "wb" if recreate else "ab")
+        logger.info(f"Writing documents to {self.path}")
+
+    async def write(
+        self, lines: List[bytes], batch_index: int, ids: Optional[List[Optional[str]]] = None
+    ) -> bool:
+        async with self.lock:
+            self.file.write(b"\n".join(lines) + b"\n")
+        self.config.metrics.inc("total_batches")
+        self.config.metrics.inc("successful_docs", len(lines))
+        return True
+
+    async def delete(self, ids: List[str]) -> int:
+        raise ValueError("A file sink cannot apply deletes")
+
+    async def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def run_worker_pool(
+    jobs: AsyncIterator[Any],
+    handle: Callable[[Any], Awaitable[None]],
+    num_workers: int,
+    max_pending: int,
+    metrics: Optional[SyncMetrics] = None,
 ):
-    if (
-        not config.callback_url
-        or not added
-        or not config.callback_url.strip()
-    ):
-        return
-    payload = {
-        "collection": collection_name,
-        "batch_start": batch_start,
-        "batch_size": batch_size,
-        "added": added,
-    }
-    headers = {"Content-Type": "application/json"}
-    if config.callback_headers:
-        headers.update(config.callback_headers)
+    """Run `handle(job)` on a fixed set of worker tasks fed through a bounded queue.
+
+    The number of tasks and buffered jobs stays constant however many jobs
+    `jobs` produces; iteration pauses while the queue is full.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+    if metrics is not None:
+        metrics.gauges["pending_batches"] = queue.qsize
+
+    async def feed():
+        async for job in jobs:
+            await queue.put(job)
+        for _ in range(num_workers):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            await handle(job)
+
+    tasks = [asyncio.create_task(feed())]
+    tasks.extend(asyncio.create_task(work()) for _ in range(num_workers))
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                config.callback_url, json=payload, headers=headers, timeout=30
-            )
-            if response.status_code not in (200, 201, 202, 204):
-                logger.warning(
-                    f"Callback to {config.callback_url} returned {response.status_code}"
-                )
-    except Exception as exc:
-        logger.warning(f"Callback POST failed: {exc}")
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let the feeder leave `jobs.__anext__` before the caller closes `jobs`.
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
-def record_failed_batch(
-    config: SyncConfig,
+async def push_to_typesense_with_workers(
+    data: List[Dict[str, Any]],
     collection_name: str,
-    batch_start: int,
+    config: SyncConfig,
     batch_size: int,
-    reason: str,
+    num_workers: int = 5,
 ):
-    if not config.failed_batch_log:
-        return
-    entry = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "collection": collection_name,
-        "batch_start": batch_start,
-        "batch_size": batch_size,
-        "reason": reason,
-    }
+    """Push data to Typesense using concurrent workers, each handling one batch at a time.
+
+    Workers receive batch start offsets and slice `data` only when they pick a
+    batch up, so no per-batch tasks or copies exist ahead of time.
+    """
+    total = len(data)
+    pbar = tqdm(total=total, desc="Indexing to Typesense")
+
+    async def batch_starts():
+        for start in range(0, total, batch_size):
+            yield start
+
+    async def handle(start: int):
+        batch = data[start : start + batch_size]
+        await import_batch(batch, start, collection_name, config)
+        pbar.update(len(batch))
+
     try:
-        with open(config.failed_batch_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry) + "\n")
-    except Exception as exc:
-        logger.warning(f"Could not write failed batch log: {exc}")
+        await run_worker_pool(batch_starts(), handle, num_workers, num_workers * 2)
+    finally:
+        pbar.close()
 
 
-async def push_to_typesense(
-    data: List[Dict[str, Any]],
+async def stream_to_typesense(
+    chunks: AsyncIterator[RowChunk],
     collection_name: str,
     config: SyncConfig,
-    batch_size: int = 50,
-    global_limit: Optional[int] = None,
-    start_index: int = 0,
+    batch_size: int,
+    num_workers: int = 5,
+    cursor: Optional[KeysetCursor] = None,
+    tombstone_column: Optional[str] = None,
+    sink: Optional[Sink] = None,
+    start_offset: int = 0,
 ):
-    banned_fields = set(BANNED_FIELDS)
-    if global_limit is not None:
-        data = data[:global_limit]
-    logger.info(
-        f"Indexing {len(data)} records into Typesense collection '{collection_name}'"
-    )
-    host = config.typesense_host.rstrip("/")
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        pbar = tqdm(total=len(data), desc="Indexing to Typesense")
-        i = 0
-        while i < len(data):
-            if global_limit is not None and i >= global_limit:
-                break
-            end_index = i + batch_size
-            if global_limit is not None:
-                end_index = min(end_index, global_limit)
-            batch = data[i:end_index]
-            jsonl_data = ""
-            for record in batch:
-                for banned in banned_fields:
-                    record.pop(banned, None)
-                record.pop("id", None)
-                if "dexter_id" in record:
-                    try:
-                        record["dexter_id"] = int(record["dexter_id"])
-                    except (ValueError, TypeError):
-                        record["dexter_id"] = 0
-                if "kvk_number" in record:
-                    try:
-                        kvk_val = record["kvk_number"]
-                        if isinstance(kvk_val, str):
-                            kvk_val = kvk_val.strip().replace("-", "").replace(" ", "")
-                        record["kvk_number"] = int(kvk_val)
-                    except (ValueError, TypeError, AttributeError):
-                        record["kvk_number"] = 0
-                for k, v in list(record.items()):
-                    record[k] = coerce_value(v)
-                jsonl_data += json.dumps(record) + "\n"
-            if jsonl_data.endswith("\n"):
-                jsonl_data = jsonl_data[:-1]
-            max_retries = 3
-            attempt = 0
-            if config.metrics_lock:
-                async with config.metrics_lock:
-                    config.metrics["total_batches"] += 1
-            batch_success_count = 0
-            reason = ""
-            batch_failed = True
-            while attempt < max_retries:
-                try:
-                    url = f"{host}/collections/{collection_name}/documents/import?action=upsert"
-                    logger.debug(f"Posting batch {i}-{end_index} to {url}, size={len(jsonl_data)} bytes")
-                    response = await client.post(
-                        url,
-                        headers={
-                            "X-TYPESENSE-API-KEY": config.typesense_api_key,
-                            "Content-Type": "application/json",
-                        },
-                        content=jsonl_data,
-                    )
-                    logger.debug(f"Response status: {response.status_code}")
-                    if response.status_code == 413:
-                        batch_size = max(10, batch_size // 2)
-                        reason = "request too large"
-                        logger.warning(
-                            f"Request too large. Reducing batch size to {batch_size} and retrying."
-                        )
-                        break
-                    if response.status_code != 200:
-                        reason = response.text
-                        attempt += 1
-                        logger.warning(f"Failed to index batch: {reason}")
-                        if attempt < max_retries:
-                            await asyncio.sleep(2 * attempt)
-                            continue
-                        break
-                    response_lines = response.text.strip().split("\n")
-                    success_in_batch = 0
-                    for j, line in enumerate(response_lines):
-                        try:
-                            result = json.loads(line)
-                            if not result.get("success", False):
-                                logger.warning(
-                                    f"Failed to index document {i+j}: {line}"
-                                )
-                            else:
-                                success_in_batch += 1
-                        except json.JSONDecodeError:
-                            logger.warning(f"Could not parse response line: {line}")
-                    batch_success_count = success_in_batch
-                    reason = "success"
-                    batch_failed = False
-                    await maybe_notify_callback(
-                        config,
-                        collection_name,
-                        start_index,
-                        len(batch),
-                        batch_success_count,
-                    )
-                    async with config.metrics_lock:
-                        config.metrics["successful_documents"] += batch_success_count
-                    break
-                except (
-                    httpx.RequestError,
-                    httpx.TimeoutException,
-                    httpx.ConnectError,
-                ) as e:
-                    attempt += 1
-                    reason = str(e)
-                    logger.error(
-                        f"Network error indexing batch (attempt {attempt}/{max_retries}): {e}"
-                    )
-                    if attempt < max_retries:
-                        await asyncio.sleep(2 * attempt)
-                        continue
-                    logger.error(
-                        f"Giving up on this batch after {max_retries} attempts."
+    """Index rows while they are still being fetched.
+
+    Chunks are encoded and cut into import batches of at most `batch_size`
+    rows and the current byte budget, then handed to the workers through a
+    bounded queue, so the fetch side pauses whenever indexing falls behind and
+    only `max_pending_batches` batches are ever held in memory at once. Rows
+    whose `tombstone_column` is set are turned into deletes by document id.
+    Batches go to `sink`, by default the Typesense collection. Rows are
+    numbered for derived fields from `start_offset` + 1.
+    """
+    if sink is None:
+        sink = TypesenseSink(config, collection_name)
+    pbar = tqdm(total=config.global_limit, desc="Indexing to Typesense")
+
+    encoder = get_document_encoder(config)
+    control = get_import_control(config)
+    metrics = config.metrics
+    metrics.gauges["import_in_flight"] = lambda: control.in_flight
+    metrics.gauges["import_concurrency"] = lambda: control.concurrency
+    metrics.gauges["batch_bytes_budget"] = lambda: control.batch_bytes
+    loop = asyncio.get_running_loop()
+
+    digests = get_digest_index(config)
+    transform = None
+    if config.transform_processes:
+        transform = TransformPool(encoder, config.transform_processes)
+
+    def encode(rows: List[Any], position: int) -> "asyncio.Future[Tuple[List[bytes], float]]":
+        if transform:
+            return transform.submit(rows, position)
+        future = loop.create_future()
+        started = loop.time()
+        lines = encoder.encode_lines(rows, position)
+        future.set_result((lines, loop.time() - started))
+        return future
+
+    async def batches():
+        # A resumed checkpoint keeps numbering rows where the last run stopped.
+        row_offset = start_offset + getattr(cursor, "start_offset", 0)
+        seq = 0
+        # Chunks being encoded, oldest first; with worker processes a few are
+        # kept in flight so every process has work while batches stay in order.
+        encoding: Deque[Tuple[int, RowChunk, int, List[str], Any, asyncio.Future]] = deque()
+        depth = 2 * config.transform_processes
+        done = False
+        while not done:
+            # Timed here rather than in each source: this is the wait the
+            # pipeline actually sees, whichever source or partitioning is used.
+            started = loop.time()
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                done = True
+            else:
+                metrics.observe("fetch_seconds", loop.time() - started)
+                metrics.inc("rows_fetched", len(chunk.rows))
+                rows = chunk.rows
+                deleted_ids: List[str] = []
+                if tombstone_column:
+                    live = []
+                    for row in rows:
+                        if is_tombstone(row[tombstone_column]):
+                            deleted_ids.append(str(coerce_value(row[config.document_id_column])))
+                        else:
+                            live.append(row)
+                    rows = live
+                ids = document_ids(config, rows) if digests else None
+                encoding.append(
+                    (
+                        seq,
+                        chunk,
+                        row_offset,
+                        deleted_ids,
+                        ids,
+                        encode(rows, row_offset + 1),
                     )
-                    break
-                except Exception as e:
-                    reason = str(e)
-                    logger.error(f"Error indexing batch: {e}")
-                    raise
-            if batch_failed:
-                async with config.metrics_lock:
-                    config.metrics["failed_batches"] += 1
-                record_failed_batch(
-                    config,
-                    collection_name,
-                    start_index,
-                    len(batch),
-                    reason or "unknown failure",
                 )
-            pbar.update(len(batch))
-            i += len(batch)
+                row_offset += len(rows) + len(deleted_ids)
+                seq += 1
+
+            while encoding and (done or len(encoding) > depth):
+                chunk_seq, source_chunk, offset, deleted_ids, ids, encoded = encoding.popleft()
+                lines, seconds = await encoded
+                metrics.observe("encode_seconds", seconds)
+                metrics.inc("bytes_encoded", sum(len(line) for line in lines))
+                positions = None
+                if ids is not None:
+                    known = digests.lookup(collection_name, [i for i in ids if i is not None])
+                    derived = encoder.derived_fields
+                    positions = [
+                        j
+                        for j, (doc_id, line) in enumerate(zip(ids, lines))
+                        if doc_id is None or known.get(doc_id) != digests.digest(line, derived)
+                    ]
+                    metrics.inc("skipped_unchanged", len(lines) - len(positions))
+                    pbar.update(len(lines) - len(positions))
+                    lines = [lines[j] for j in positions]
+                    ids = [ids[j] for j in positions]
+                upserts = split_lines_by_bytes(lines, control.batch_bytes, batch_size)
+                if cursor:
+                    cursor.register(
+                        chunk_seq,
+                        source_chunk.last_key,
+                        len(upserts) + (1 if deleted_ids else 0),
+                        partition=source_chunk.partition,
+                        offset=offset,
+                        rows=len(source_chunk.rows),
+                    )
+                if deleted_ids:
+                    yield chunk_seq, offset, deleted_ids, "delete", None
+                for start, batch in upserts:
+                    # Positions stay those of the source rows when unchanged ones were skipped.
+                    position = offset + (positions[start] if positions else start)
+                    batch_ids = ids[start : start + len(batch)] if ids is not None else None
+                    yield chunk_seq, position, batch, "upsert", batch_ids
+
+    async def handle(item):
+        seq, batch_index, batch, action, ids = item
+        if action == "delete":
+            deleted = await sink.delete(batch)
+            logger.info(f"Deleted {deleted} of {len(batch)} tombstoned documents")
+            ok = True
+        else:
+            ok = await sink.write(batch, batch_index, ids)
+        if cursor:
+            cursor.batch_done(seq, ok)
+        pbar.update(len(batch))
+
+    try:
+        await run_worker_pool(
+            batches(), handle, num_workers, config.max_pending_batches, metrics=metrics
+        )
+    finally:
         pbar.close()
+        await chunks.aclose()
+        if transform:
+            transform.close()
 
 
-async def push_to_typesense_with_workers(
-    data: List[Dict[str, Any]],
-    collection_name: str,
+async def replay_failed_documents(config: SyncConfig):
+    """Re-import spooled documents for the collection through the worker pool.
+
+    Every replayed entry is removed once its batch has been attempted; whatever
+    Typesense rejects again is spooled anew with the fresh error, so a crash
+    mid-replay can only leave duplicates in the spool, never lose documents.
+    """
+    spool = get_failed_spool(config)
+    total = spool.count(config.collection_name)
+    if not total:
+        logger.info(f"No spooled documents for '{config.collection_name}'")
+        return
+    logger.info(f"Replaying {total} spooled documents into '{config.collection_name}'")
+    pbar = tqdm(total=total, desc="Replaying failed documents")
+
+    async def handle(item):
+        batch_index, entries = item
+        await import_lines(
+            [document for _, document in entries], batch_index, config.collection_name, config
+        )
+        spool.remove([spool_id for spool_id, _ in entries])
+        pbar.update(len(entries))
+
+    async def batches():
+        offset = 0
+        for entries in spool.iter_batches(config.collection_name, config.chunk_size):
+            documents = [document for _, document in entries]
+            control = get_import_control(config)
+            for start, lines in split_lines_by_bytes(
+                documents, control.batch_bytes, config.batch_size
+            ):
+                yield offset + start, entries[start : start + len(lines)]
+            offset += len(entries)
+
+    try:
+        await run_worker_pool(
+            batches(), handle, config.num_workers, config.max_pending_batches, config.metrics
+        )
+    finally:
+        pbar.close()
+    logger.info(f"{spool.count(config.collection_name)} documents remain spooled")
+
+
+async def run_incremental(
     config: SyncConfig,
-    batch_size: int,
-    num_workers: int = 5,
+    pool: asyncpg.Pool,
+    column_types: Dict[str, str],
+    fields: List[Dict[str, Any]],
+    run,
 ):
-    """Push data to Typesense using concurrent workers, each handling one batch at a time."""
-    semaphore = asyncio.Semaphore(num_workers)
-    total = len(data)
-    pbar = tqdm(total=total, desc="Indexing to Typesense")
-    banned_fields = set(BANNED_FIELDS)
-    host = config.typesense_host.rstrip("/")
+    if config.updated_column not in column_types:
+        raise ValueError(f"Column '{config.updated_column}' not found on '{config.table_name}'.")
+    key_column, key_type = await resolve_key_column(
+        pool, config.table_name, config.document_id_column
+    )
+    config.document_id_column = key_column
+    tombstone_column = config.tombstone_column if config.delete_mode == "tombstone" else None
+    columns = project_columns(
+        list(column_types), required=[key_column, config.updated_column, tombstone_column]
+    )
+
+    state = SyncState(config.state_file)
+    since = None
+    if not config.drop_collection:
+        since = state.get_mark(config.table_name, config.collection_name, config.updated_column)
+    high_water = {"mark": None}
+
+    async def tracked(chunks: AsyncIterator[RowChunk]):
+        async for chunk in chunks:
+            high_water["mark"] = chunk.last_key
+            yield chunk
+
+    await run(
+        fields,
+        tracked(
+            iter_rows_changed_since(
+                pool,
+                config.table_name,
+                config.updated_column,
+                column_types[config.updated_column],
+                key_column,
+                key_type,
+                since,
+                config.chunk_size,
+                config.global_limit,
+                columns=columns,
+            )
+        ),
+        tombstone_column=tombstone_column,
+    )
+
+    if config.delete_mode == "diff":
+        deleted = await delete_missing_documents(
+            pool, config.table_name, key_column, config.collection_name, config
+        )
+        logger.info(f"Deleted {deleted} documents no longer present in the source table")
+
+    if config.metrics.counters["failed_batches"]:
+        logger.warning(
+            "Some batches failed; keeping the previous high-water mark so the next run retries them."
+        )
+    elif high_water["mark"] is not None:
+        state.set_mark(
+            config.table_name, config.collection_name, config.updated_column, high_water["mark"]
+        )
+        logger.info(f"High-water mark for {config.updated_column} is now {high_water['mark']}")
 
-    async def worker(batch: List[Dict[str, Any]], batch_index: int):
-        async with semaphore:
-            logger.info(f"Worker starting batch {batch_index}, size {len(batch)}")
-            
-            # Prepare JSONL payload
-            jsonl_data = ""
-            for record in batch:
-                for banned in banned_fields:
-                    record.pop(banned, None)
-                record.pop("id", None)
-                if "dexter_id" in record:
-                    try:
-                        record["dexter_id"] = int(record["dexter_id"])
-                    except (ValueError, TypeError):
-                        record["dexter_id"] = 0
-                if "kvk_number" in record:
-                    try:
-                        kvk_val = record["kvk_number"]
-                        if isinstance(kvk_val, str):
-                            kvk_val = kvk_val.strip().replace("-", "").replace(" ", "")
-                        record["kvk_number"] = int(kvk_val)
-                    except (ValueError, TypeError, AttributeError):
-                        record["kvk_number"] = 0
-                for k, v in list(record.items()):
-                    record[k] = coerce_value(v)
-                jsonl_data += json.dumps(record) + "\n"
-            
-            if jsonl_data.endswith("\n"):
-                jsonl_data = jsonl_data[:-1]
-            
-            if config.metrics_lock:
-                async with config.metrics_lock:
-                    config.metrics["total_batches"] += 1
-            
-            # Post to Typesense
-            max_retries = 3
-            attempt = 0
-            batch_success_count = 0
-            reason = ""
-            
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                while attempt < max_retries:
-                    try:
-                        url = f"{host}/collections/{collection_name}/documents/import?action=upsert"
-                        logger.debug(f"POST {url}, batch {batch_index}, {len(jsonl_data)} bytes")
-                        
-                        response = await client.post(
-                            url,
-                            headers={
-                                "X-TYPESENSE-API-KEY": config.typesense_api_key,
-                                "Content-Type": "application/json",
-                            },
-                            content=jsonl_data,
-                        )
-                        logger.debug(f"Batch {batch_index} response: {response.status_code}")
-                        
-                        if response.status_code == 413:
-                            reason = "request too large"
-                            logger.warning(f"Batch {batch_index} too large")
-                            break
-                        
-                        if response.status_code != 200:
-                            reason = response.text
-                            attempt += 1
-                            logger.warning(f"Batch {batch_index} failed: {reason}")
-                            if attempt < max_retries:
-                                await asyncio.sleep(2 * attempt)
-                                continue
-                            break
-                        
-                        # Parse success count
-                        response_lines = response.text.strip().split("\n")
-                        for j, line in enumerate(response_lines):
-                            try:
-                                result = json.loads(line)
-                                if result.get("success", False):
-                                    batch_success_count += 1
-                                else:
-                                    logger.warning(f"Doc {batch_index+j} failed: {line}")
-                            except json.JSONDecodeError:
-                                logger.warning(f"Could not parse: {line}")
-                        
-                        if config.metrics_lock:
-                            async with config.metrics_lock:
-                                config.metrics["successful_docs"] += batch_success_count
-                        
-                        logger.info(f"Batch {batch_index} indexed {batch_success_count}/{len(batch)} docs")
-                        
-                        await maybe_notify_callback(
-                            config, collection_name, batch_index, len(batch), batch_success_count
-                        )
-                        break
-                        
-                    except (httpx.RequestError, httpx.TimeoutException, httpx.ConnectError) as e:
-                        attempt += 1
-                        reason = str(e)
-                        logger.error(f"Batch {batch_index} network error (attempt {attempt}/{max_retries}): {e}")
-                        if attempt < max_retries:
-                            await asyncio.sleep(2 * attempt)
-                            continue
-                        logger.error(f"Batch {batch_index} failed after {max_retries} attempts")
-                        if config.metrics_lock:
-                            async with config.metrics_lock:
-                                config.metrics["failed_batches"] += 1
-                        record_failed_batch(config, collection_name, batch_index, len(batch), reason)
-                        break
-                    except Exception as e:
-                        reason = str(e)
-                        logger.error(f"Batch {batch_index} error: {e}")
-                        if config.metrics_lock:
-                            async with config.metrics_lock:
-                                config.metrics["failed_batches"] += 1
-                        record_failed_batch(config, collection_name, batch_index, len(batch), reason)
-                        break
-            
-            pbar.update(len(batch))
 
-    tasks = []
-    for i in range(0, total, batch_size):
-        batch = data[i : i + batch_size]
-        tasks.append(asyncio.create_task(worker(batch, i)))
+def job_argv(job: Dict[str, Any]) -> List[str]:
+    """Turn one jobs-file entry into the command line it stands for.
 
-    await asyncio.gather(*tasks)
-    pbar.close()
+    `table` and `collection` are the positional arguments; every other key is
+    a long option with underscores or dashes (`batch_size: 100` is
+    `--batch-size 100`). true adds a bare flag, false/null leave it out, and
+    lists repeat it.
+    """
+    argv = [str(job["table"]), str(job["collection"])]
+    for key, value in job.items():
+        if key in ("table", "collection") or value is None or value is False:
+            continue
+        flag = f"--{key.replace('_', '-')}"
+        if value is True:
+            argv.append(flag)
+        elif isinstance(value, list):
+            for item in value:
+                argv.extend([flag, str(item)])
+        else:
+            argv.extend([flag, str(value)])
+    return argv
+
+
+async def sync_jobs(config: SyncConfig):
+    """Run every job of --jobs-file in this process under shared limits.
+
+    Jobs on the same database share one asyncpg pool (the connection limit is
+    split between databases), all of them share the HTTP client, and their
+    import requests go through one ImportScheduler for the byte and rate budget.
+    """
+    with open(config.jobs_file, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    defaults = spec.get("defaults", {})
+    jobs = []
+    for entry in spec.get("jobs", []):
+        job = parse_args(job_argv({**defaults, **entry}))
+        if job.jobs_file or job.follow or job.replay_failed:
+            raise ValueError(
+                f"Job {job.table_name} -> {job.collection_name}: --jobs-file, --follow and "
+                "--replay-failed cannot be used inside a jobs file"
+            )
+        jobs.append(job)
+    if not jobs:
+        raise ValueError(f"No jobs in {config.jobs_file}")
+
+    config.http_client = get_http_client(config)
+    scheduler = ImportScheduler(config.max_inflight_bytes, config.max_requests_per_second)
+    uris = sorted({job.pg_uri for job in jobs if job.pg_uri})
+    pools: Dict[str, asyncpg.Pool] = {}
+    try:
+        for uri in uris:
+            size = max(1, config.max_db_connections // len(uris))
+            pools[uri] = await asyncpg.create_pool(uri, min_size=1, max_size=size)
+        for job in jobs:
+            job.http_client = config.http_client
+            job.import_scheduler = scheduler
+            job.shared_pool = pools.get(job.pg_uri)
+
+        slots = asyncio.Semaphore(config.max_parallel_jobs)
+
+        async def run_job(job: SyncConfig):
+            async with slots:
+                logger.info(f"Starting job {job.table_name} -> {job.collection_name}")
+                job.metrics.start()
+                try:
+                    await sync(job)
+                finally:
+                    await close_callback_dispatcher(job)
+                    if job.failed_spool is not None:
+                        job.failed_spool.close()
+                    if job.digest_index is not None:
+                        job.digest_index.close()
+
+        async with serve_metrics(config, [job.metrics for job in jobs]):
+            try:
+                results = await asyncio.gather(
+                    *(run_job(job) for job in jobs), return_exceptions=True
+                )
+            finally:
+                if config.metrics_report:
+                    write_metrics_report(config.metrics_report, [job.metrics for job in jobs])
+    finally:
+        for pool in pools.values():
+            await pool.close()
+
+    failed = 0
+    for job, result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.error(f"Job {job.table_name} -> {job.collection_name} failed: {result!r}")
+        else:
+            logger.info(f"Job {job.table_name} -> {job.collection_name}: {job.metrics.summary()}")
+    if failed:
+        raise RuntimeError(f"{failed} of {len(jobs)} jobs failed")
 
 
 async def main():
     config = parse_args()
-    config.metrics_lock = asyncio.Lock()
-    await maybe_drop_typesense_collection(config)
+    try:
+        if config.jobs_file:
+            await sync_jobs(config)
+        else:
+            config.metrics.start()
+            async with serve_metrics(config, [config.metrics]):
+                try:
+                    if config.replay_failed:
+                        await replay_failed_documents(config)
+                    else:
+                        await sync(config)
+                finally:
+                    await close_callback_dispatcher(config)
+                    if config.metrics_report:
+                        write_metrics_report(config.metrics_report, [config.metrics])
+    finally:
+        await close_callback_dispatcher(config)
+        if config.http_client is not None:
+            await config.http_client.aclose()
+        if config.failed_spool is not None:
+            config.failed_spool.close()
+        if config.digest_index is not None:
+            config.digest_index.close()
 
-    supabase_client = None
-    if not config.pg_uri:
-        supabase_client = create_client(config.supabase_url, config.supabase_anon_key)
 
-    sample_row: Dict[str, Any]
-    if config.pg_uri:
-        async with asyncpg.create_pool(
-            config.pg_uri, min_size=1, max_size=4
-        ) as pool:
-            data = await fetch_all_rows_from_postgres(
-                pool, config.table_name, config.chunk_size, config.global_limit
-            )
-            if not data:
-                logger.warning("No data found in the source table.")
-                return
-            sample_row = await fetch_sample_row_from_postgres(pool, config.table_name)
-    else:
-        assert supabase_client is not None
-        data = await fetch_all_rows_from_supabase(
-            supabase_client, config.table_name, config.chunk_size, config.global_limit
+async def sync(config: SyncConfig):
+    if not config.sink_file:
+        await maybe_drop_typesense_collection(config)
+
+    streamed = {"rows": 0}
+
+    async def count_rows(chunks: AsyncIterator[RowChunk]):
+        async for chunk in chunks:
+            streamed["rows"] += len(chunk.rows)
+            yield chunk
+
+    async def run(
+        fields: List[Dict[str, Any]],
+        chunks: AsyncIterator[RowChunk],
+        cursor: Optional[KeysetCursor] = None,
+        resuming: bool = False,
+        tombstone_column: Optional[str] = None,
+    ):
+        collection_name = config.collection_name
+        if config.alias_swap:
+            await check_alias_available(config, config.collection_name)
+            collection_name = generation_name(config.collection_name)
+            logger.info(f"Loading new generation '{collection_name}'")
+            chunks = count_rows(chunks)
+        schema = finalize_schema(
+            build_typesense_schema(collection_name, fields, config.fields_dir), config.id_column
         )
-        if not data:
-            logger.warning("No data found in the Supabase table.")
-            return
-        sample_row = await fetch_sample_row_from_supabase(
-            supabase_client, config.table_name
+        derived = derived_fields_for_schema(schema)
+        get_document_encoder(config).derived_fields = derived
+
+        if config.sink_file:
+            sink: Sink = JsonlFileSink(config, config.sink_file)
+        else:
+            sink = TypesenseSink(config, collection_name)
+        await sink.prepare(
+            schema,
+            recreate=not (
+                resuming or config.incremental or config.alias_swap or config.digest_cache
+            ),
         )
+        start_offset = 0
+        if config.incremental and "row_id" in derived and isinstance(sink, TypesenseSink):
+            # Upserts go into a kept collection: number them after its rows.
+            start_offset = await fetch_max_row_id(config, collection_name)
+        try:
+            await stream_to_typesense(
+                chunks,
+                collection_name,
+                config,
+                config.batch_size,
+                num_workers=config.num_workers,
+                cursor=cursor,
+                tombstone_column=tombstone_column,
+                sink=sink,
+                start_offset=start_offset,
+            )
+        finally:
+            await sink.close()
+        if config.alias_swap:
+            await publish_generation(
+                config, config.collection_name, collection_name, streamed["rows"]
+            )
+
+    try:
+        async with create_source(config) as source:
+            fields = await source.fields()
+            if not isinstance(source, PostgresSource) or not (config.incremental or config.follow):
+                await run(fields, source.chunks(), cursor=source.cursor, resuming=source.resuming)
+                if config.delete_mode == "diff" and isinstance(source, PostgresSource):
+                    # --digest-cache keeps the collection, so rows deleted since
+                    # the last run have to be removed explicitly.
+                    deleted = await delete_missing_documents(
+                        source.pool,
+                        config.table_name,
+                        config.document_id_column,
+                        config.collection_name,
+                        config,
+                    )
+                    logger.info(f"Deleted {deleted} documents no longer present in the source table")
+            else:
+                initial_load = True
+                if config.follow:
+                    key_column, key_type = await resolve_key_column(
+                        source.pool, config.table_name, config.document_id_column
+                    )
+                    config.document_id_column = key_column
+                    initial_load = await prepare_replication(source.pool, config)
+                    if not initial_load:
+                        logger.info(
+                            f"Slot '{config.slot_name}' already exists; resuming from it without a full load."
+                        )
 
-    if not data:
+                if not initial_load:
+                    pass
+                elif config.incremental:
+                    await run_incremental(config, source.pool, source.column_types, fields, run)
+                else:
+                    await run(
+                        fields, source.chunks(), cursor=source.cursor, resuming=source.resuming
+                    )
+
+                if config.follow:
+                    schema = finalize_schema(
+                        build_typesense_schema(config.collection_name, fields, config.fields_dir),
+                        config.id_column,
+                    )
+                    get_document_encoder(config).derived_fields = derived_fields_for_schema(
+                        schema
+                    )
+                    await follow_changes(
+                        source.pool, config, key_column, key_type, source.columns
+                    )
+    except ValueError as e:
+        if "No data found" not in str(e):
+            raise
         logger.warning("No data found in the source table.")
         return
 
-    schema = build_typesense_schema_from_sample(config.collection_name, sample_row)
-    schema = finalize_schema(schema, data, config.id_column)
-
-    await create_typesense_collection(schema, config)
-    await push_to_typesense_with_workers(
-        data, config.collection_name, config, config.batch_size, num_workers=20
-    )
-    async with config.metrics_lock:
-        logger.info(f"Sync metrics: {config.metrics}")
+    log_metrics(config.metrics)
 
 
 if __name__ == "__main__":